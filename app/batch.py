@@ -0,0 +1,139 @@
+"""Pre-generate study materials for a whole syllabus.
+
+Reads (subject, topic) pairs from a CSV (``subject,topic`` header) or JSONL
+file and runs them through the regular generation pipeline at batch
+priority, so the shared cache is warm before students ask for them:
+
+    python -m app.batch syllabus.csv --concurrency 4 --pdf-dir guides/
+
+Finished topics are appended to a checkpoint file and skipped when the same
+command is run again, so an interrupted run resumes where it stopped.
+Each topic is generated under its own name: a close match that is already
+cached does not count, so ``python -m app.export`` finds every topic.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from app.services.cache import normalize_key
+
+
+def read_syllabus(path):
+    """Return the (subject, topic) pairs listed in a CSV or JSONL file"""
+    pairs = []
+    with open(path, newline='', encoding='utf-8') as handle:
+        if path.endswith('.jsonl'):
+            rows = (json.loads(line) for line in handle if line.strip())
+        else:
+            rows = csv.DictReader(handle)
+        for row in rows:
+            subject = (row.get('subject') or '').strip()
+            topic = (row.get('topic') or '').strip()
+            if subject and topic:
+                pairs.append((subject, topic))
+    return pairs
+
+
+def checkpoint_key(subject, topic):
+    return f"{normalize_key(subject)}\x1f{normalize_key(topic)}"
+
+
+def load_checkpoint(path):
+    """Keys of topics already generated by a previous run.
+
+    Entries of older runs without ``exact`` may have been served by a close
+    match; they are not trusted and are looked up again.
+    """
+    done = set()
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as handle:
+            for line in handle:
+                if line.strip():
+                    entry = json.loads(line)
+                    if entry.get('status') == 'ok' and entry.get('exact'):
+                        done.add(checkpoint_key(entry['subject'], entry['topic']))
+    return done
+
+
+def run(pairs, concurrency=4, checkpoint=None, pdf_dir=None, fresh=False):
+    """Generate every pair not yet in the checkpoint; returns the number of failures"""
+    # Imported here so --help works without the Gemini stack
+    from app.services.exporters import EXPORTERS
+    from app.services.gemini import build_study_material
+    from app.services.scheduler import BATCH
+
+    done = load_checkpoint(checkpoint)
+    todo = []
+    seen = set(done)
+    for subject, topic in pairs:
+        key = checkpoint_key(subject, topic)
+        if key not in seen:
+            seen.add(key)
+            todo.append((subject, topic))
+    print(f"{len(todo)} topics to generate ({len(pairs) - len(todo)} already done or duplicates)")
+    if pdf_dir:
+        os.makedirs(pdf_dir, exist_ok=True)
+
+    failures = 0
+
+    def generate(subject, topic):
+        start = time.monotonic()
+        materials = build_study_material(subject, topic, priority=BATCH, fresh=fresh, exact=True)
+        if not materials:
+            raise RuntimeError("generation failed")
+        if pdf_dir:
+            # Same file name as the UI's PDF download
+            pdf = EXPORTERS['pdf']
+            with open(os.path.join(pdf_dir, pdf.filename(subject, topic)), 'wb') as handle:
+                pdf.write(subject, topic, materials, handle)
+        return time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(generate, subject, topic): (subject, topic) for subject, topic in todo}
+        for count, future in enumerate(as_completed(futures), 1):
+            subject, topic = futures[future]
+            entry = {'subject': subject, 'topic': topic}
+            try:
+                entry['seconds'] = round(future.result(), 2)
+                entry['status'] = 'ok'
+                entry['exact'] = True
+            except Exception as e:
+                entry['status'] = 'error'
+                entry['error'] = str(e)
+                failures += 1
+            print(f"[{count}/{len(todo)}] {entry['status']}: {subject} / {topic}")
+            if checkpoint:
+                with open(checkpoint, 'a', encoding='utf-8') as handle:
+                    handle.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate study materials into the shared cache.")
+    parser.add_argument('syllabus', help="CSV (subject,topic header) or JSONL file of topics")
+    parser.add_argument('--concurrency', type=int, default=4, help="topics generated at once (default: 4)")
+    parser.add_argument('--checkpoint', help="progress file used to resume (default: <syllabus>.checkpoint.jsonl)")
+    parser.add_argument('--pdf-dir', help="also render a PDF study guide per topic into this directory")
+    parser.add_argument('--fresh', action='store_true',
+                        help="regenerate topics even when they are already cached")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if not (os.getenv('GEMINI_API_KEY') or os.getenv('STUDYMATE_FAKE_GEMINI')):
+        print("Please set GEMINI_API_KEY in your .env file", file=sys.stderr)
+        return 2
+    checkpoint = args.checkpoint or os.path.splitext(args.syllabus)[0] + '.checkpoint.jsonl'
+    failures = run(read_syllabus(args.syllabus), args.concurrency, checkpoint, args.pdf_dir, args.fresh)
+    if failures:
+        print(f"{failures} topics failed; run the same command again to retry them")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
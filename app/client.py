@@ -0,0 +1,103 @@
+"""Client for the generation service in app.server.
+
+``ServiceClient.stream_study_material`` has the same contract as the core's
+``stream_study_material``, so the UI can switch between generating in
+process and delegating to a service with one setting.
+"""
+import json
+import time
+import urllib.error
+import urllib.request
+
+from app.errors import ConfigurationError, GenerationError, NotCachedError, StudyMateError
+from app.models import ITEM_TYPES, StudyMaterials, section_value
+from app.services.topic_index import TopicMatch
+
+_ERRORS = {'ConfigurationError': ConfigurationError, 'NotCachedError': NotCachedError}
+
+# /extend answers only once the model has, with no keep-alives in between
+EXTEND_TIMEOUT = 300.0
+
+
+def decode_event(event):
+    """Turn an NDJSON event back into ``(section, item)``; raises on error events"""
+    if 'error' in event:
+        raise _ERRORS.get(event.get('type') or event.get('error_type'), GenerationError)(event['error'])
+    if event.get('done'):
+        return None, StudyMaterials.from_dict(event['materials'])
+    section = event['section']
+    if section == 'summary':
+        return section, section_value(section, event['item'])
+    if section == 'match':
+        return section, TopicMatch.from_dict(event['item'])
+    return section, ITEM_TYPES[section].from_dict(event['item'])
+
+
+class ServiceClient:
+    """Submit generation jobs to a StudyMate service and follow their progress"""
+
+    def __init__(self, base_url, timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path, payload=None, timeout=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method='POST' if data else 'GET',
+                                         headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            return urllib.request.urlopen(request, timeout=timeout or self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                document = json.load(e)
+            except ValueError:
+                document = {}
+            error = _ERRORS.get(document.get('error_type'), GenerationError)
+            raise error(f"Service error: {document.get('error', e)}") from e
+        except urllib.error.URLError as e:
+            raise StudyMateError(f"Cannot reach the generation service at {self.base_url}: {e.reason}") from e
+
+    def submit(self, subject, topic, priority='interactive', fresh=False):
+        """Queue a job; returns its status document (with ``id``)"""
+        payload = {'subject': subject, 'topic': topic, 'priority': priority, 'fresh': fresh}
+        with self._request('/jobs', payload) as response:
+            return json.load(response)
+
+    def status(self, job_id):
+        with self._request(f'/jobs/{job_id}') as response:
+            return json.load(response)
+
+    def wait(self, job_id, poll_interval=1.0, timeout=None):
+        """Poll until the job finishes and return its StudyMaterials"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            info = self.status(job_id)
+            if info['status'] == 'done':
+                return StudyMaterials.from_dict(info['materials'])
+            if info['status'] == 'failed':
+                decode_event(info)
+            if deadline is not None and time.monotonic() > deadline:
+                raise GenerationError(f"Job {job_id} did not finish within {timeout} seconds")
+            time.sleep(poll_interval)
+
+    def events(self, job_id):
+        """Yield ``(section, item)`` events of a job as the service produces them"""
+        with self._request(f'/jobs/{job_id}/events') as response:
+            for line in response:
+                if line.strip():
+                    event = json.loads(line)
+                    if not event.get('keepalive'):
+                        yield decode_event(event)
+
+    def generate_study_material(self, subject, topic, priority='interactive', fresh=False):
+        """Generate through the service, blocking until the materials are ready"""
+        return self.wait(self.submit(subject, topic, priority, fresh)['id'])
+
+    def stream_study_material(self, subject, topic, priority='interactive', fresh=False):
+        """Like the core's stream_study_material, but generated by the service"""
+        yield from self.events(self.submit(subject, topic, priority, fresh)['id'])
+
+    def extend_materials(self, subject, topic, section, count=5):
+        """Like the core's extend_materials, but generated by the service"""
+        payload = {'subject': subject, 'topic': topic, 'section': section, 'count': count}
+        with self._request('/extend', payload, max(self.timeout, EXTEND_TIMEOUT)) as response:
+            return StudyMaterials.from_dict(json.load(response)['materials'])
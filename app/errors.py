@@ -0,0 +1,14 @@
+class StudyMateError(Exception):
+    """Base class for errors raised by the generation core"""
+
+
+class ConfigurationError(StudyMateError):
+    """The app is not set up to generate (e.g. no GEMINI_API_KEY)"""
+
+
+class GenerationError(StudyMateError):
+    """Generating study materials failed"""
+
+
+class NotCachedError(StudyMateError):
+    """A topic has no cached materials to work from (e.g. extending one never generated)"""
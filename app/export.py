@@ -0,0 +1,68 @@
+"""Export the cached study materials of a whole syllabus as one zip.
+
+Takes the same CSV or JSONL topic list as ``app.batch`` and writes one
+folder per topic with a file per format, rendered in a process pool:
+
+    python -m app.export syllabus.csv --format pdf --format anki -o class.zip
+
+Only topics cached under their own name are exported (not close
+matches of them); generate the rest first with
+``python -m app.batch``.
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from app.batch import read_syllabus
+from app.services.exporters import EXPORTERS, export_bulk
+
+
+def cached_entries(pairs, missing):
+    """Yield ``(subject, topic, materials)`` for cached topics, adding the others to ``missing``.
+
+    Only exact cache entries count: a close match's materials would be
+    exported under the wrong topic's name.
+    """
+    from app.services.gemini import cached_study_material
+
+    for subject, topic in pairs:
+        materials = cached_study_material(subject, topic, exact=True)
+        if materials is None:
+            missing.append((subject, topic))
+        else:
+            yield subject, topic, materials
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export cached study materials for a syllabus as a zip.")
+    parser.add_argument('syllabus', help="CSV (subject,topic header) or JSONL file of topics")
+    parser.add_argument('-o', '--output', required=True, help="zip file to write")
+    parser.add_argument('--format', dest='formats', action='append', choices=list(EXPORTERS),
+                        help="format to include; repeat for several (default: pdf)")
+    parser.add_argument('--workers', type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help="topics rendered or waiting to be written at once (default: twice the workers)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if not (os.getenv('GEMINI_API_KEY') or os.getenv('STUDYMATE_FAKE_GEMINI')):
+        print("Please set GEMINI_API_KEY in your .env file", file=sys.stderr)
+        return 2
+    missing = []
+    with open(args.output, 'wb') as output:
+        exported = export_bulk(cached_entries(read_syllabus(args.syllabus), missing), output,
+                               args.formats or ['pdf'], args.workers, args.max_pending)
+    print(f"Exported {exported} topics to {args.output}")
+    for subject, topic in missing:
+        print(f"not cached: {subject} / {topic}")
+    if missing:
+        # app.batch generates every topic under its own name, close match or not
+        print(f"{len(missing)} topics are not cached under their own name yet; "
+              f"generate them with python -m app.batch {args.syllabus}")
+    return 1 if missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
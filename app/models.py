@@ -0,0 +1,167 @@
+import re
+from dataclasses import dataclass, fields
+from functools import lru_cache
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def _text(value):
+    return value if isinstance(value, str) else ('' if value is None else str(value))
+
+
+# Records are built by setting slots directly: a frozen dataclass __init__
+# goes through object.__setattr__ per field anyway, with more overhead
+_new = object.__new__
+_set = object.__setattr__
+
+
+@lru_cache(maxsize=None)
+def _names(cls):
+    # dataclasses.fields() rebuilds its tuple on every call; items are built by the thousand
+    return tuple(field.name for field in fields(cls))
+
+
+class _Record:
+    """Base for the immutable, slotted study-material records.
+
+    Slots keep each item to a few pointers instead of a per-instance dict,
+    and immutability lets every session share one cached instance.
+    """
+
+    __slots__ = ()
+
+    # Field naming what an item is about (its question, term or problem)
+    KEY = None
+
+    # Frozen slotted classes need explicit pickle support (used by process pools)
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in _names(type(self)))
+
+    def __setstate__(self, state):
+        for name, value in zip(_names(type(self)), state):
+            _set(self, name, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        record = _new(cls)
+        for name in _names(cls):
+            _set(record, name, _text(data.get(name)))
+        return record
+
+    @classmethod
+    def from_clean(cls, data):
+        """Build from a dict already validated against the parser schema, skipping conversions"""
+        record = _new(cls)
+        for name in _names(cls):
+            _set(record, name, data[name])
+        return record
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in _names(type(self))}
+
+    @property
+    def key(self):
+        return getattr(self, self.KEY)
+
+    def fingerprint(self):
+        """Hash of the item's key text ignoring case, punctuation and spacing, to spot duplicates"""
+        return hash(' '.join(_WORD.findall(self.key.casefold())))
+
+
+@dataclass(frozen=True)
+class Flashcard(_Record):
+    __slots__ = ('question', 'answer')
+    KEY = 'question'
+    question: str
+    answer: str
+
+
+@dataclass(frozen=True)
+class MCQ(_Record):
+    __slots__ = ('question', 'options', 'correct_answer', 'explanation')
+    KEY = 'question'
+    question: str
+    options: tuple
+    correct_answer: str
+    explanation: str
+
+    @classmethod
+    def from_dict(cls, data):
+        options = data.get('options')
+        record = _new(cls)
+        _set(record, 'question', _text(data.get('question')))
+        _set(record, 'options', tuple([_text(option) for option in options])
+             if isinstance(options, (list, tuple)) else ())
+        _set(record, 'correct_answer', _text(data.get('correct_answer')))
+        _set(record, 'explanation', _text(data.get('explanation')))
+        return record
+
+    @classmethod
+    def from_clean(cls, data):
+        record = super().from_clean(data)
+        # The schema only checks that options is a list
+        _set(record, 'options', tuple([_text(option) for option in record.options]))
+        return record
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['options'] = list(self.options)
+        return data
+
+
+@dataclass(frozen=True)
+class Term(_Record):
+    __slots__ = ('term', 'explanation')
+    KEY = 'term'
+    term: str
+    explanation: str
+
+
+@dataclass(frozen=True)
+class ExampleProblem(_Record):
+    __slots__ = ('problem', 'solution', 'explanation')
+    KEY = 'problem'
+    problem: str
+    solution: str
+    explanation: str
+
+
+# Item type for each list section of the materials
+ITEM_TYPES = {
+    'flashcards': Flashcard,
+    'mcqs': MCQ,
+    'hard_terms': Term,
+    'example_problems': ExampleProblem,
+}
+
+
+def section_value(section, value):
+    """Convert a parsed JSON section (summary string or list of dicts) to its typed form"""
+    if section == 'summary':
+        return _text(value)
+    from_dict = ITEM_TYPES[section].from_dict
+    return tuple([from_dict(item) for item in value or () if isinstance(item, dict)])
+
+
+@dataclass(frozen=True)
+class StudyMaterials(_Record):
+    __slots__ = ('summary', 'flashcards', 'mcqs', 'hard_terms', 'example_problems', '__weakref__')
+    summary: str
+    flashcards: tuple
+    mcqs: tuple
+    hard_terms: tuple
+    example_problems: tuple
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*[section_value(name, data.get(name)) for name in _names(cls)])
+
+    def to_dict(self):
+        """Plain JSON-ready dict in the format the model returns"""
+        data = {'summary': self.summary}
+        for section in ITEM_TYPES:
+            data[section] = [item.to_dict() for item in getattr(self, section)]
+        return data
+
+    def has_items(self):
+        return bool(self.flashcards or self.mcqs or self.hard_terms or self.example_problems)
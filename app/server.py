@@ -0,0 +1,366 @@
+"""Headless study-material generation service.
+
+Runs the generation core behind a small HTTP API so generation workers
+scale separately from the Streamlit UI servers:
+
+    python -m app.server --port 8750 --workers 8
+
+- ``POST /jobs`` with ``{"subject": ..., "topic": ..., "priority": "interactive"|"batch"}``
+  queues a job and answers ``202`` with its id. A job already running for
+  the same topic is returned instead of starting another. Add
+  ``"fresh": true`` to generate anew instead of serving cached materials.
+- ``GET /jobs/<id>`` reports the status, and the materials once done.
+- ``GET /jobs/<id>/events`` streams the job as NDJSON, one line per item
+  as it is generated (replaying earlier ones first), ending with a
+  ``done`` or ``error`` line.
+- ``POST /extend`` with ``{"subject", "topic", "section", "count"}`` adds
+  ``count`` new items to one section of the topic's cached materials and
+  answers with the extended materials once they are ready (``404`` if the
+  topic isn't cached).
+- ``GET /healthz`` and ``GET /metrics`` (Prometheus text) for operations.
+
+Point the UI at it with ``STUDYMATE_SERVICE_URL=http://host:8750``.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+from app.errors import ConfigurationError, NotCachedError, StudyMateError
+from app.models import ITEM_TYPES
+from app.services.cache import normalize_key
+from app.services.scheduler import BATCH, INTERACTIVE
+from app.utils.telemetry import get_telemetry
+
+PRIORITIES = {'interactive': INTERACTIVE, 'batch': BATCH}
+
+# Finished jobs are kept this long (seconds) for polling clients
+JOB_TTL = float(os.getenv('STUDYMATE_JOB_TTL', '3600'))
+
+# Most items one /extend request may ask for
+MAX_EXTEND_COUNT = 50
+
+
+def encode_event(section, item):
+    """JSON-ready form of a ``(section, item)`` generation event"""
+    if section is None:
+        return {'done': True, 'materials': item.to_dict()}
+    return {'section': section, 'item': item if isinstance(item, str) else item.to_dict()}
+
+
+class Job:
+    """One generation request and the events it has produced so far"""
+
+    def __init__(self, subject, topic, priority, fresh=False):
+        self.id = uuid.uuid4().hex
+        self.subject = subject
+        self.topic = topic
+        self.priority = priority
+        self.fresh = fresh
+        self.status = 'queued'
+        self.events = []
+        self.materials = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._cond = threading.Condition()
+
+    @property
+    def key(self):
+        return (normalize_key(self.subject), normalize_key(self.topic), self.fresh)
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def publish(self, event):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def start(self):
+        with self._cond:
+            self.status = 'running'
+
+    def finish(self, materials):
+        with self._cond:
+            self.materials = materials
+            self.status = 'done'
+            self.finished = time.time()
+            self.events.append(encode_event(None, materials))
+            self._cond.notify_all()
+
+    def fail(self, error):
+        with self._cond:
+            self.error = error
+            self.status = 'failed'
+            self.finished = time.time()
+            self.events.append({'error': str(error), 'type': type(error).__name__})
+            self._cond.notify_all()
+
+    def follow(self, timeout=30.0):
+        """Yield every event from the first, blocking for new ones until the job ends.
+
+        Yields None after ``timeout`` seconds without news so the caller can
+        send a keep-alive.
+        """
+        index = 0
+        while True:
+            with self._cond:
+                if index == len(self.events) and self.active:
+                    self._cond.wait(timeout)
+                pending = self.events[index:]
+                active = self.active
+            index += len(pending)
+            if pending:
+                yield from pending
+            elif active:
+                yield None
+            if not active and index == len(self.events):
+                return
+
+    def describe(self):
+        """Status document returned by ``GET /jobs/<id>``"""
+        with self._cond:
+            info = {
+                'id': self.id,
+                'subject': self.subject,
+                'topic': self.topic,
+                'status': self.status,
+                'fresh': self.fresh,
+                'events': len(self.events),
+                'created': self.created,
+                'finished': self.finished,
+            }
+            if self.materials is not None:
+                info['materials'] = self.materials.to_dict()
+            if self.error is not None:
+                info['error'] = str(self.error)
+                info['error_type'] = type(self.error).__name__
+        return info
+
+
+class JobQueue:
+    """Runs jobs on a worker pool and keeps them around for ``ttl`` seconds after they finish"""
+
+    def __init__(self, workers=4, ttl=JOB_TTL, generate=None):
+        if generate is None:
+            from app.services.gemini import stream_study_material as generate
+        self.generate = generate
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self.submitted = 0
+        self.deduplicated = 0
+
+    def submit(self, subject, topic, priority=INTERACTIVE, fresh=False):
+        """Queue a job, or return the one already running for this topic"""
+        job = Job(subject, topic, priority, fresh)
+        with self._lock:
+            self._expire()
+            running = self._active.get(job.key)
+            if running is not None and running.active:
+                self.deduplicated += 1
+                return running
+            self._jobs[job.id] = job
+            self._active[job.key] = job
+            self.submitted += 1
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.start()
+        try:
+            for section, item in self.generate(job.subject, job.topic, job.priority, fresh=job.fresh):
+                if section is None:
+                    job.finish(item)
+                else:
+                    job.publish(encode_event(section, item))
+            if job.active:
+                job.fail(StudyMateError("Generation ended without materials"))
+        except Exception as e:
+            job.fail(e)
+        finally:
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+            return {
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'queued': sum(job.status == 'queued' for job in jobs),
+                'running': sum(job.status == 'running' for job in jobs),
+                'done': sum(job.status == 'done' for job in jobs),
+                'failed': sum(job.status == 'failed' for job in jobs),
+            }
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """HTTP front end for a JobQueue (set as ``server.jobs``)"""
+
+    server_version = 'StudyMate/1'
+
+    def send_json(self, status, document, headers=None):
+        body = json.dumps(document, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_POST(self):
+        path = self.path.rstrip('/')
+        if path == '/extend':
+            self.extend_materials()
+            return
+        if path != '/jobs':
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            request = self.read_json()
+            subject = str(request.get('subject') or '').strip()
+            topic = str(request.get('topic') or '').strip()
+            priority = PRIORITIES[request.get('priority', 'interactive')]
+            fresh = request.get('fresh', False)
+            if not isinstance(fresh, bool):
+                raise ValueError(fresh)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_json(400, {'error': 'expected JSON with subject, topic, an optional priority '
+                                          '("interactive" or "batch") and an optional boolean fresh'})
+            return
+        if not (subject and topic):
+            self.send_json(400, {'error': 'subject and topic are required'})
+            return
+        job = self.server.jobs.submit(subject, topic, priority, fresh)
+        self.send_json(202, job.describe(), {'Location': f'/jobs/{job.id}'})
+
+    def extend_materials(self):
+        try:
+            request = self.read_json()
+            subject = str(request.get('subject') or '').strip()
+            topic = str(request.get('topic') or '').strip()
+            section = request['section']
+            count = int(request.get('count', 5))
+            if section not in ITEM_TYPES or not 0 < count <= MAX_EXTEND_COUNT or not (subject and topic):
+                raise ValueError(section)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_json(400, {'error': f'expected JSON with subject, topic, a section '
+                                          f'({", ".join(ITEM_TYPES)}) and a count up to {MAX_EXTEND_COUNT}'})
+            return
+        try:
+            # The materials always come from the cache, never from the request
+            materials = self.server.extend(subject, topic, section, count)
+        except StudyMateError as e:
+            status = {ConfigurationError: 503, NotCachedError: 404}.get(type(e), 502)
+            self.send_json(status, {'error': str(e), 'error_type': type(e).__name__})
+            return
+        self.send_json(200, {'materials': materials.to_dict()})
+
+    def do_GET(self):
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        if parts == ['healthz']:
+            self.send_json(200, {'status': 'ok', 'jobs': self.server.jobs.stats()})
+        elif parts == ['metrics']:
+            body = get_telemetry().render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif len(parts) in (2, 3) and parts[0] == 'jobs':
+            job = self.server.jobs.get(parts[1])
+            if job is None:
+                self.send_json(404, {'error': 'unknown job'})
+            elif len(parts) == 2:
+                self.send_json(200, job.describe())
+            elif parts[2] == 'events':
+                self.stream_events(job)
+            else:
+                self.send_json(404, {'error': 'not found'})
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def stream_events(self, job):
+        # HTTP/1.0 without Content-Length: the body ends when the connection closes
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            for event in job.follow():
+                line = json.dumps(event if event is not None else {'keepalive': True}, ensure_ascii=False)
+                self.wfile.write(line.encode('utf-8') + b'\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=8750, workers=4, jobs=None, extend=None):
+    """Build (but don't start) the HTTP server around a JobQueue"""
+    if extend is None:
+        from app.services.gemini import extend_materials as extend
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.jobs = jobs or JobQueue(workers)
+    server.extend = extend
+    get_telemetry().register('jobs', server.jobs.stats)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve study-material generation over HTTP.")
+    parser.add_argument('--host', default=os.getenv('STUDYMATE_SERVICE_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('STUDYMATE_SERVICE_PORT', '8750')))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('STUDYMATE_SERVICE_WORKERS', '8')),
+                        help="jobs generated at once (default: 8)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    # Fail at startup rather than on every job when Gemini isn't configured
+    from app.services.gemini import configure_gemini
+    try:
+        configure_gemini()
+    except ConfigurationError as e:
+        parser.exit(2, f"{e}\n")
+
+    server = make_server(args.host, args.port, args.workers)
+    print(f"Serving study-material jobs on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import contextlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+
+from app.utils.telemetry import get_telemetry
+
+# Defaults can be overridden through the environment (see .env example)
+DEFAULT_CACHE_PATH = os.path.join('.studymate_cache', 'materials.db')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB of compressed payloads
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 days
+
+# Only quotes and sentence punctuation are trimmed; symbols like C++, C# and .NET are part of the name
+_PUNCTUATION_EDGES = re.compile(r'^[\s"\'`]+|[\s"\'`.,;:!?]+$')
+_WHITESPACE = re.compile(r'\s+')
+_QUOTES = str.maketrans('‘’“”', "''\"\"")
+
+
+def normalize_key(text):
+    """Canonical form of a subject or topic so equivalent inputs share a cache entry"""
+    text = unicodedata.normalize('NFKC', text or '')
+    text = text.translate(_QUOTES).casefold()
+    text = _WHITESPACE.sub(' ', text)
+    return _PUNCTUATION_EDGES.sub('', text)
+
+
+def make_key(subject, topic, prompt_version, model_name):
+    """Cache key for a normalized subject/topic generated with a given prompt and model"""
+    return '\x1f'.join([normalize_key(subject), normalize_key(topic), prompt_version, model_name])
+
+
+def _encode(materials):
+    payload = json.dumps(materials, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(payload.encode('utf-8'), 6)
+
+
+def _decode(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class MaterialsCache:
+    """Interface for study-material caches shared between workers.
+
+    Entries are keyed on the normalized subject/topic plus the prompt template
+    version and model name, so changing either invalidates old entries.
+    """
+
+    def get(self, subject, topic, prompt_version, model_name):
+        raise NotImplementedError
+
+    def set(self, subject, topic, prompt_version, model_name, materials):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class NullCache(MaterialsCache):
+    """Cache that stores nothing (used when the disk cache is disabled)"""
+
+    def __init__(self):
+        self.misses = 0
+
+    def get(self, subject, topic, prompt_version, model_name):
+        self.misses += 1
+        return None
+
+    def set(self, subject, topic, prompt_version, model_name, materials):
+        pass
+
+    def stats(self):
+        return {'hits': 0, 'misses': self.misses, 'evictions': 0, 'entries': 0, 'bytes': 0}
+
+
+class SQLiteCache(MaterialsCache):
+    """On-disk cache in a single SQLite file with LRU and TTL eviction.
+
+    SQLite handles locking between processes, so every Streamlit worker (and
+    every restart) pointing at the same file shares the cached materials.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS materials (
+                    key TEXT PRIMARY KEY,
+                    subject TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_materials_accessed ON materials (accessed_at)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A fresh connection per operation keeps us safe across Streamlit threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, subject, topic, prompt_version, model_name):
+        key = make_key(subject, topic, prompt_version, model_name)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT payload, created_at FROM materials WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                conn.execute('DELETE FROM materials WHERE key = ?', (key,))
+                self._count(evictions=1)
+                row = None
+            if row is None:
+                self._count(misses=1)
+                return None
+            conn.execute('UPDATE materials SET accessed_at = ? WHERE key = ?', (now, key))
+        self._count(hits=1)
+        return _decode(row[0])
+
+    def set(self, subject, topic, prompt_version, model_name, materials):
+        key = make_key(subject, topic, prompt_version, model_name)
+        blob = _encode(materials)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO materials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, normalize_key(subject), normalize_key(topic), prompt_version,
+                 model_name, blob, len(blob), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        evicted = 0
+        if self.ttl_seconds:
+            evicted += conn.execute(
+                'DELETE FROM materials WHERE created_at < ?', (now - self.ttl_seconds,)
+            ).rowcount
+        if self.max_bytes:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM materials').fetchone()[0]
+            if total > self.max_bytes:
+                rows = conn.execute('SELECT key, size FROM materials ORDER BY accessed_at').fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                conn.executemany('DELETE FROM materials WHERE key = ?', stale)
+                evicted += len(stale)
+        if evicted:
+            self._count(evictions=evicted)
+
+    def _count(self, hits=0, misses=0, evictions=0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.evictions += evictions
+
+    def stats(self):
+        """Hit/miss/eviction counters for this process plus the shared cache size"""
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM materials'
+            ).fetchone()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': size,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache, built from the environment on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = os.getenv('STUDYMATE_CACHE_PATH', DEFAULT_CACHE_PATH)
+            if path.lower() in ('', 'off', 'none'):
+                _cache = NullCache()
+            else:
+                _cache = SQLiteCache(
+                    path,
+                    max_bytes=int(os.getenv('STUDYMATE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+                    ttl_seconds=int(os.getenv('STUDYMATE_CACHE_TTL', DEFAULT_TTL_SECONDS)),
+                )
+        return _cache
+
+
+def set_cache(cache):
+    """Swap in another MaterialsCache implementation"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def _collect():
+    return _cache.stats() if _cache is not None else {}
+
+
+get_telemetry().register('cache', _collect)
@@ -0,0 +1,184 @@
+import threading
+import time
+import google.generativeai as genai
+from app.utils.telemetry import get_telemetry
+
+# Use the latest available models, in order of preference
+MODEL_NAMES = [
+    'gemini-2.0-flash',
+    'gemini-1.5-flash',
+    'gemini-pro',
+]
+
+# Models that reject response_mime_type (JSON response mode)
+NO_JSON_MODE = ('gemini-pro', 'gemini-1.0')
+
+
+def _adapt_kwargs(model_name, kwargs):
+    """Drop JSON response mode for models that don't support it"""
+    config = kwargs.get('generation_config')
+    if not model_name.startswith(NO_JSON_MODE) or not isinstance(config, dict):
+        return kwargs
+    config = {key: value for key, value in config.items() if key != 'response_mime_type'}
+    return {**kwargs, 'generation_config': config or None}
+
+
+class _Health:
+    """Circuit-breaker state for one model"""
+
+    def __init__(self, base_backoff):
+        self.failures = 0
+        self.open_until = 0.0
+        self.backoff = base_backoff
+        self.calls = 0
+        self.errors = 0
+        self.slow_calls = 0
+        self.fallbacks = 0
+
+
+class ModelPool:
+    """Process-wide Gemini client pool with health-based fallback.
+
+    ``genai.configure`` runs once and one ``GenerativeModel`` per name is
+    reused for every request, so calls share the SDK's HTTP connections.
+    A model that keeps failing (or answering slower than
+    ``latency_threshold``) is taken out of rotation with exponential backoff
+    and requests go to the next entry in ``model_names`` meanwhile.
+
+    The pool exposes ``generate_content`` and ``model_name`` so it can be
+    used wherever a single model object was used before. ``cache_name``
+    names the configured models as a whole and doesn't change on failover,
+    so cached results stay valid whichever model is serving. ``factory``
+    builds the model objects instead of ``genai`` (e.g. the offline
+    FakeModel).
+    """
+
+    def __init__(self, api_key, model_names=MODEL_NAMES, failure_threshold=3,
+                 latency_threshold=60.0, base_backoff=5.0, max_backoff=300.0, factory=None):
+        if factory is None:
+            genai.configure(api_key=api_key)
+            factory = genai.GenerativeModel
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.cache_name = '+'.join(model_names)
+        self._lock = threading.Lock()
+        self._models = {}
+        self._health = {}
+        for model_name in model_names:
+            try:
+                self._models[model_name] = factory(model_name)
+            except Exception:
+                continue
+            self._health[model_name] = _Health(base_backoff)
+        if not self._models:
+            raise RuntimeError("No compatible Gemini model found.")
+
+    def candidates(self):
+        """Model names to try, healthy ones first in preference order"""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [name for name, health in self._health.items() if health.open_until <= now]
+            if healthy:
+                return healthy
+            # Everything is tripped: probe whichever circuit reopens first
+            return sorted(self._health, key=lambda name: self._health[name].open_until)
+
+    @property
+    def model_name(self):
+        """Name of the model new requests are currently routed to"""
+        return self.candidates()[0]
+
+    def generate_content(self, prompt, acquire=None, **kwargs):
+        """Call ``generate_content`` on the first healthy model, failing over on errors.
+
+        ``acquire`` is called before each failover attempt, so a rate limiter
+        can count every API request and not just the first.
+        """
+        error = None
+        for attempt, model_name in enumerate(self.candidates()):
+            if attempt and acquire is not None:
+                acquire()
+            start = time.monotonic()
+            try:
+                response = self._models[model_name].generate_content(prompt, **_adapt_kwargs(model_name, kwargs))
+            except Exception as e:
+                self.record_failure(model_name)
+                error = e
+                continue
+            self.record_success(model_name, time.monotonic() - start)
+            if model_name != next(iter(self._models)):
+                # Served by a lower-preference model because the preferred one failed or is tripped
+                with self._lock:
+                    self._health[model_name].fallbacks += 1
+            return response
+        raise error
+
+    def record_success(self, model_name, latency):
+        with self._lock:
+            health = self._health[model_name]
+            health.calls += 1
+            if latency > self.latency_threshold:
+                # Latency spikes count towards tripping the circuit like errors do
+                health.slow_calls += 1
+                self._trip(health)
+            else:
+                health.failures = 0
+                health.backoff = self.base_backoff
+
+    def record_failure(self, model_name):
+        with self._lock:
+            health = self._health[model_name]
+            health.calls += 1
+            health.errors += 1
+            self._trip(health)
+
+    def _trip(self, health):
+        health.failures += 1
+        if health.failures >= self.failure_threshold:
+            health.open_until = time.monotonic() + health.backoff
+            health.backoff = min(health.backoff * 2, self.max_backoff)
+            health.failures = 0
+
+    def stats(self):
+        """Per-model call, error and circuit state counters"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    'calls': health.calls,
+                    'errors': health.errors,
+                    'slow_calls': health.slow_calls,
+                    'fallbacks': health.fallbacks,
+                    'healthy': health.open_until <= now,
+                }
+                for name, health in self._health.items()
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(api_key, factory=None):
+    """Return the process-wide pool, configuring Gemini on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool(api_key, factory=factory)
+        return _pool
+
+
+def set_pool(pool):
+    """Swap in another pool (e.g. one of fake models for benchmarks)"""
+    global _pool
+    with _pool_lock:
+        _pool = pool
+
+
+def _collect():
+    return _pool.stats() if _pool is not None else {}
+
+
+get_telemetry().register('pool', _collect, label='model')
@@ -0,0 +1,318 @@
+"""Export study materials as PDF, Markdown, CSV or an Anki deck.
+
+Each format is an Exporter in EXPORTERS; register_exporter adds more.
+Text formats are produced line by line and written out in chunks, so a
+document never has to exist as one string. ``export_bulk`` renders many
+topics into one zip using a process pool.
+"""
+import csv
+import hashlib
+import html
+import io
+import itertools
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from app.services.pdf_generator import generate_pdf
+from app.utils.telemetry import get_telemetry
+
+# Characters of text gathered before each write to the output
+CHUNK_CHARS = 64 * 1024
+
+# Exported documents kept in memory by export_document
+EXPORT_CACHE_SIZE = int(os.getenv('STUDYMATE_EXPORT_CACHE_SIZE', '32'))
+
+
+def safe_filename(text):
+    return re.sub(r'[^\w.-]+', '_', text).strip('_') or 'untitled'
+
+
+class Exporter:
+    """Writes study materials in one file format to a binary file object"""
+
+    name = None
+    label = None
+    extension = None
+    mime = None
+
+    def chunks(self, subject, topic, materials):
+        """Yield the document as encoded pieces"""
+        raise NotImplementedError
+
+    def write(self, subject, topic, materials, output):
+        for chunk in self.chunks(subject, topic, materials):
+            output.write(chunk)
+
+    def export(self, subject, topic, materials):
+        """The whole document as bytes"""
+        output = io.BytesIO()
+        self.write(subject, topic, materials, output)
+        return output.getvalue()
+
+    def filename(self, subject, topic):
+        return safe_filename(f"{subject}_{topic}_StudyGuide") + self.extension
+
+
+class TextExporter(Exporter):
+    """Exporter for text formats, built from the lines that ``lines`` yields"""
+
+    encoding = 'utf-8'
+
+    def lines(self, subject, topic, materials):
+        raise NotImplementedError
+
+    def chunks(self, subject, topic, materials):
+        pending = []
+        size = 0
+        for line in self.lines(subject, topic, materials):
+            pending.append(line)
+            size += len(line)
+            if size >= CHUNK_CHARS:
+                yield ''.join(pending).encode(self.encoding)
+                pending = []
+                size = 0
+        if pending:
+            yield ''.join(pending).encode(self.encoding)
+
+
+class PDFExporter(Exporter):
+    """The printable study guide.
+
+    fpdf2 lays out the whole document before writing it, so this format is
+    written to the output in one piece.
+    """
+
+    name = 'pdf'
+    label = 'PDF'
+    extension = '.pdf'
+    mime = 'application/pdf'
+
+    def chunks(self, subject, topic, materials):
+        yield generate_pdf(subject, topic, materials)
+
+    def write(self, subject, topic, materials, output):
+        generate_pdf(subject, topic, materials, output=output)
+
+
+class MarkdownExporter(TextExporter):
+    name = 'markdown'
+    label = 'Markdown'
+    extension = '.md'
+    mime = 'text/markdown'
+
+    def lines(self, subject, topic, materials):
+        yield f"# {topic}\n\n*{subject}*\n\n"
+        if materials.summary:
+            yield f"## Summary\n\n{materials.summary}\n\n"
+        if materials.hard_terms:
+            yield "## Key Terms\n\n"
+            for term in materials.hard_terms:
+                yield f"### {term.term}\n\n{term.explanation}\n\n"
+        if materials.flashcards:
+            yield "## Flashcards\n\n"
+            for i, card in enumerate(materials.flashcards, 1):
+                yield f"**Q{i}. {card.question}**\n\n{card.answer}\n\n"
+        if materials.mcqs:
+            yield "## Multiple Choice Questions\n\n"
+            for i, mcq in enumerate(materials.mcqs, 1):
+                yield f"**{i}. {mcq.question}**\n\n"
+                for option in mcq.options:
+                    yield f"- {option}\n"
+                yield f"\n**Answer:** {mcq.correct_answer}\n\n"
+                if mcq.explanation:
+                    yield f"*Explanation:* {mcq.explanation}\n\n"
+        if materials.example_problems:
+            yield "## Example Problems\n\n"
+            for i, example in enumerate(materials.example_problems, 1):
+                yield f"### Example {i}\n\n**Problem:** {example.problem}\n\n"
+                yield f"**Solution:**\n\n```text\n{example.solution}\n```\n\n"
+                if example.explanation:
+                    yield f"**Explanation:** {example.explanation}\n\n"
+
+
+class CSVExporter(TextExporter):
+    """One row per item (and one for the summary), for spreadsheets"""
+
+    name = 'csv'
+    label = 'CSV'
+    extension = '.csv'
+    mime = 'text/csv'
+    # Excel only detects UTF-8 with a byte order mark
+    encoding = 'utf-8-sig'
+
+    COLUMNS = ('section', 'prompt', 'answer', 'options', 'explanation')
+
+    def rows(self, materials):
+        if materials.summary:
+            yield 'summary', '', materials.summary, '', ''
+        for card in materials.flashcards:
+            yield 'flashcards', card.question, card.answer, '', ''
+        for mcq in materials.mcqs:
+            yield 'mcqs', mcq.question, mcq.correct_answer, '\n'.join(mcq.options), mcq.explanation
+        for term in materials.hard_terms:
+            yield 'hard_terms', term.term, term.explanation, '', ''
+        for example in materials.example_problems:
+            yield 'example_problems', example.problem, example.solution, '', example.explanation
+
+    def lines(self, subject, topic, materials):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.COLUMNS)
+        for row in self.rows(materials):
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+
+class AnkiExporter(TextExporter):
+    """Tab-separated notes with Anki's file headers (File > Import in Anki 2.1.55+)"""
+
+    name = 'anki'
+    label = 'Anki deck'
+    extension = '.txt'
+    mime = 'text/plain'
+
+    @staticmethod
+    def field(text):
+        # Fields are HTML on one line; a tab would start the next field
+        return html.escape(text.replace('\t', ' ')).replace('\n', '<br>')
+
+    def notes(self, materials):
+        """(section, front, back) for each item, as HTML"""
+        field = self.field
+        for card in materials.flashcards:
+            yield 'flashcards', field(card.question), field(card.answer)
+        for mcq in materials.mcqs:
+            front = '<br>'.join([field(mcq.question)] + [field(option) for option in mcq.options])
+            back = field(mcq.correct_answer)
+            if mcq.explanation:
+                back += '<br><br>' + field(mcq.explanation)
+            yield 'mcqs', front, back
+        for term in materials.hard_terms:
+            yield 'hard_terms', field(term.term), field(term.explanation)
+        for example in materials.example_problems:
+            back = field(example.solution)
+            if example.explanation:
+                back += '<br><br>' + field(example.explanation)
+            yield 'example_problems', field(example.problem), back
+
+    def lines(self, subject, topic, materials):
+        deck = '::'.join(['StudyMate'] + [name.replace('::', ':') for name in (subject, topic)])
+        yield f"#separator:tab\n#html:true\n#notetype:Basic\n#deck:{deck}\n#tags column:3\n"
+        tags = f"studymate {safe_filename(subject)} {safe_filename(topic)}"
+        for section, front, back in self.notes(materials):
+            yield f"{front}\t{back}\t{tags} {section}\n"
+
+
+EXPORTERS = {}
+
+
+def register_exporter(exporter):
+    """Make an Exporter available under its ``name``"""
+    EXPORTERS[exporter.name] = exporter
+    return exporter
+
+
+for _exporter in (PDFExporter(), MarkdownExporter(), CSVExporter(), AnkiExporter()):
+    register_exporter(_exporter)
+
+
+def get_exporter(name):
+    try:
+        return EXPORTERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown export format {name!r}; expected one of {', '.join(EXPORTERS)}") from None
+
+
+@lru_cache(maxsize=EXPORT_CACHE_SIZE)
+def export_document(name, subject, topic, materials):
+    """Memoized export to one format, so UI reruns don't rebuild the document.
+
+    StudyMaterials is immutable, so it can key the cache directly, like the
+    PDF cache does.
+    """
+    return get_exporter(name).export(subject, topic, materials)
+
+
+get_telemetry().register('export_cache', lambda: export_document.cache_info()._asdict())
+
+
+def _export_topic(subject, topic, materials, formats, directory, index):
+    """Worker task: write each format of one topic to a file in ``directory`` and return the paths"""
+    paths = []
+    for name in formats:
+        path = os.path.join(directory, f"{index}-{name}")
+        with open(path, 'wb') as output:
+            EXPORTERS[name].write(subject, topic, materials, output)
+        paths.append(path)
+    return paths
+
+
+def _archive_folder(subject, topic, used):
+    """Unique ``subject/topic`` folder in the archive, recorded in ``used``.
+
+    Different names can map to the same safe filename (``C`` and ``C++``
+    both become ``C``), so a clash gets a short hash of the real names.
+    """
+    folder = f"{safe_filename(subject)}/{safe_filename(topic)}"
+    if folder in used:
+        digest = hashlib.sha1(f"{subject}\x1f{topic}".encode('utf-8')).hexdigest()[:8]
+        base = folder = f"{folder}_{digest}"
+        # Only a topic listed twice gets the same hash again
+        for n in itertools.count(2):
+            if folder not in used:
+                break
+            folder = f"{base}_{n}"
+    used.add(folder)
+    return folder
+
+
+def export_bulk(entries, output, formats=('pdf',), workers=None, max_pending=None):
+    """Write a zip with every format of each ``(subject, topic, materials)`` in ``entries`` to ``output``.
+
+    Topics render in a process pool, with at most ``max_pending`` (default
+    twice the workers) submitted at once. Workers write each document to a
+    temporary file, which is streamed into the archive in chunks and
+    removed, so no document is held in memory or sent between processes.
+    ``entries`` is consumed lazily and written in order. Returns the number
+    of topics exported.
+    """
+    formats = tuple(formats)
+    for name in formats:
+        get_exporter(name)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max(1, max_pending or 2 * workers)
+    exported = 0
+    used = set()
+    with get_telemetry().span('export_bulk'), \
+            tempfile.TemporaryDirectory(prefix='studymate-export-') as directory, \
+            zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        def drain(limit):
+            nonlocal exported
+            while len(pending) > limit:
+                folder, future = pending.popleft()
+                for name, path in zip(formats, future.result()):
+                    with open(path, 'rb') as source, \
+                            archive.open(folder + EXPORTERS[name].extension, 'w', force_zip64=True) as entry:
+                        shutil.copyfileobj(source, entry)
+                    os.remove(path)
+                exported += 1
+
+        for index, (subject, topic, materials) in enumerate(entries):
+            folder = _archive_folder(subject, topic, used)
+            pending.append((folder, executor.submit(_export_topic, subject, topic, materials, formats,
+                                                    directory, index)))
+            drain(max_pending - 1)
+        drain(0)
+    return exported
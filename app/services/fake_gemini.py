@@ -0,0 +1,130 @@
+import json
+import random
+import re
+import threading
+import time
+
+from app.services.prompts import DEFAULT_COUNTS
+from app.services.scheduler import estimate_tokens
+
+_SUBJECT = re.compile(r'SUBJECT:\s*(.+)')
+_TOPIC = re.compile(r'TOPIC:\s*(.+)')
+_COUNT = re.compile(r'"(\w+)": list of (?:at least )?(\d+)')
+_EXISTING = re.compile(r'already have (\d+)')
+
+
+class ResourceExhausted(Exception):
+    """Stand-in for google.api_core's quota error (matched by class name)"""
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def fake_materials(subject, topic, sections=None, counts=None, start=1):
+    """Deterministic study materials for a subject and topic, numbering items from ``start``"""
+    sections = sections or ['summary'] + list(DEFAULT_COUNTS)
+    counts = {**DEFAULT_COUNTS, **(counts or {})}
+    numbers = {section: range(start, start + count) for section, count in counts.items()}
+    materials = {}
+    if 'summary' in sections:
+        materials['summary'] = f"{topic} is a core topic in {subject}. " * 20
+    if 'flashcards' in sections:
+        materials['flashcards'] = [
+            {'question': f"What is point {i} of {topic}?", 'answer': f"Point {i} of {topic} explained in detail."}
+            for i in numbers['flashcards']
+        ]
+    if 'mcqs' in sections:
+        materials['mcqs'] = [
+            {
+                'question': f"Which statement about {topic} number {i} is true?",
+                'options': [f"{letter}) option {letter.lower()}" for letter in 'ABCD'],
+                'correct_answer': f"{'ABCD'[i % 4]}) option {'abcd'[i % 4]}",
+                'explanation': f"Option {'ABCD'[i % 4]} is correct because of {topic} rule {i}.",
+            }
+            for i in numbers['mcqs']
+        ]
+    if 'hard_terms' in sections:
+        materials['hard_terms'] = [
+            {'term': f"{topic} term {i}", 'explanation': f"Term {i} of {subject} explained with examples."}
+            for i in numbers['hard_terms']
+        ]
+    if 'example_problems' in sections:
+        materials['example_problems'] = [
+            {
+                'problem': f"Problem {i}: apply {topic}.",
+                'solution': f"Step 1: recall {topic}.\nStep 2: solve problem {i}.",
+                'explanation': f"This works because of the basics of {subject}.",
+            }
+            for i in numbers['example_problems']
+        ]
+    return materials
+
+
+class FakeModel:
+    """Local stand-in for ``genai.GenerativeModel`` that never touches the network.
+
+    Answers any study-material prompt with deterministic JSON covering the
+    sections (and item counts) the prompt asks for. ``latency`` (seconds)
+    and ``error_rate`` (raising ResourceExhausted) let schedulers and
+    retries be exercised offline; ``input_latency`` adds seconds per 1000
+    prompt tokens to model prompt processing. ``seed`` makes the injected
+    errors reproducible.
+    """
+
+    def __init__(self, model_name='fake-gemini', latency=0.0, error_rate=0.0,
+                 chunk_size=200, seed=0, input_latency=0.0):
+        self.model_name = model_name
+        self.latency = latency
+        self.input_latency = input_latency
+        self.error_rate = error_rate
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, generation_config=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise ResourceExhausted("429 Quota exceeded (fake)")
+
+        subject = _SUBJECT.search(prompt)
+        topic = _TOPIC.search(prompt)
+        sections = [name for name in ['summary'] + list(DEFAULT_COUNTS) if f'"{name}"' in prompt]
+        counts = {name: int(count) for name, count in _COUNT.findall(prompt)}
+        # Requests for more items continue the numbering so the new ones are distinct
+        existing = _EXISTING.search(prompt)
+        materials = fake_materials(
+            subject.group(1).strip() if subject else 'Subject',
+            topic.group(1).strip() if topic else 'Topic',
+            sections,
+            counts,
+            int(existing.group(1)) + 1 if existing else 1,
+        )
+        # JSON mode answers with bare compact JSON, like the real API
+        if (generation_config or {}).get('response_mime_type') == 'application/json':
+            text = json.dumps(materials)
+        else:
+            text = json.dumps(materials, indent=2)
+        prefill = self.input_latency * estimate_tokens(prompt) / 1000
+
+        if stream:
+            return self._stream(text, prefill)
+        time.sleep(prefill + self.latency)
+        return FakeResponse(text)
+
+    def _stream(self, text, prefill=0.0):
+        time.sleep(prefill)
+        # Spread the latency evenly over the chunks like a real stream
+        pieces = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        for piece in pieces:
+            time.sleep(self.latency / len(pieces))
+            yield FakeChunk(piece)
@@ -1,197 +1,444 @@
+import contextvars
+import dataclasses
+import logging
 import os
-import google.generativeai as genai
-import streamlit as st
-from app.utils.parsers import parse_response
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.services.client_pool import ModelPool, get_pool
+from app.services.cache import get_cache, make_key, normalize_key
+from app.services.fake_gemini import FakeModel
+from app.services.prompts import (
+    PROMPT_VERSION,
+    build_extension_prompt,
+    build_prompt,
+    generation_config,
+    get_prompt_usage,
+)
+from app.services.scheduler import INTERACTIVE, estimate_tokens, get_scheduler
+from app.services.singleflight import get_flights
+from app.services.topic_index import get_topic_index
+from app.errors import ConfigurationError, GenerationError, NotCachedError
+from app.models import ITEM_TYPES, StudyMaterials, section_value
+from app.utils.telemetry import get_telemetry
+from app.utils.parsers import (
+    PARSE_ERROR_SUMMARY,
+    SECTIONS,
+    IncrementalParser,
+    parse_materials,
+    parse_section,
+)
+
+# Cache version of materials merged from per-section requests
+SECTION_PROMPT_VERSION = f's{PROMPT_VERSION}'
+
+# "single" asks for everything in one prompt, "sectioned" fans out one request per section
+GENERATION_MODE = os.getenv('STUDYMATE_GENERATION_MODE', 'single')
+MAX_CONCURRENCY = int(os.getenv('STUDYMATE_MAX_CONCURRENCY', '5'))
+SECTION_RETRIES = int(os.getenv('STUDYMATE_SECTION_RETRIES', '2'))
+
+# One immutable StudyMaterials per cache key, shared by all sessions using it
+_shared = weakref.WeakValueDictionary()
+
+logger = logging.getLogger(__name__)
+
+# Expected response size used to budget tokens before the real usage is known
+EXPECTED_OUTPUT_TOKENS = 8000
 
 def configure_gemini():
-    """Configure Gemini with the correct model"""
+    """Return the shared Gemini model pool, configuring it on first use.
+
+    Raises ConfigurationError when no API key is set or no model is usable.
+    """
+    if os.getenv('STUDYMATE_FAKE_GEMINI'):
+        # Offline development against the local stub
+        return get_pool(None, factory=FakeModel)
+    
     api_key = os.getenv('GEMINI_API_KEY')
     if not api_key:
-        st.error("🔑 Please set GEMINI_API_KEY in your .env file")
-        st.info("Create a .env file in your project folder with:")
-        st.code("GEMINI_API_KEY=your_actual_api_key_here")
-        return None
+        raise ConfigurationError("Please set GEMINI_API_KEY in your .env file")
     
-    genai.configure(api_key=api_key)
-    
-    # Use the latest available models
-    model_names = [
-        'gemini-2.0-flash',
-        'gemini-1.5-flash',
-        'gemini-pro',
-    ]
+    try:
+        return get_pool(api_key)
+    except RuntimeError as e:
+        raise ConfigurationError(str(e)) from e
+
+def call_model(model, prompt, priority=INTERACTIVE, output_tokens=EXPECTED_OUTPUT_TOKENS, **kwargs):
+    """Send a Prompt through the rate-limit scheduler, retrying quota errors"""
+    scheduler = get_scheduler()
+    config = generation_config()
+    if config:
+        kwargs.setdefault('generation_config', config)
+    estimated = prompt.input_tokens + output_tokens
+    if isinstance(model, ModelPool):
+        # Every model the pool fails over to is another request against the budgets
+        kwargs['acquire'] = lambda: scheduler.acquire(estimated, priority)
+    telemetry = get_telemetry()
+    # For streams this only covers the request; _timed_chunks measures the rest
+    with telemetry.span('model_call', stream=bool(kwargs.get('stream'))):
+        response = scheduler.run(
+            lambda: model.generate_content(prompt.text, **kwargs),
+            tokens=estimated,
+            priority=priority,
+        )
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None and not kwargs.get('stream'):
+        scheduler.record_usage(estimated, usage.total_token_count)
+        input_tokens = get_prompt_usage().record(prompt.input_tokens, usage.prompt_token_count)
+        telemetry.incr('tokens', usage.candidates_token_count, kind='output')
+    else:
+        input_tokens = get_prompt_usage().record(prompt.input_tokens)
+        if not kwargs.get('stream'):
+            telemetry.incr('tokens', estimate_tokens(response.text), kind='output')
+    telemetry.incr('tokens', input_tokens, kind='input')
+    return response
+
+def _timed_chunks(response, start):
+    """Yield stream chunks, recording time to first token and time spent waiting on the model"""
+    telemetry = get_telemetry()
+    waited = 0.0
+    size = 0
+    chunks = iter(response)
+    while True:
+        before = time.perf_counter()
+        chunk = next(chunks, None)
+        now = time.perf_counter()
+        waited += now - before
+        if chunk is None:
+            break
+        if not size:
+            telemetry.observe('first_token', now - start)
+        size += len(chunk.text)
+        yield chunk
+    telemetry.observe('model_stream', waited)
+    # Streams don't report usage; same four-characters-per-token estimate as the scheduler
+    telemetry.incr('tokens', size // 4, kind='output')
+
+def _cache_name(model):
+    """Model part of cache keys: stable across pool failover, or a plain model's name"""
+    return getattr(model, 'cache_name', None) or model.model_name
+
+def _load_cached(subject, topic, version, model_name):
+    """Cached materials, shared by every session in this process while any of them holds it"""
+    telemetry = get_telemetry()
+    key = make_key(subject, topic, version, model_name)
+    materials = _shared.get(key)
+    if materials is not None:
+        telemetry.incr('cache_lookups', result='shared')
+        return materials
+    with telemetry.span('cache_lookup'):
+        data = get_cache().get(subject, topic, version, model_name)
+    if data is None:
+        telemetry.incr('cache_lookups', result='miss')
+        return None
+    telemetry.incr('cache_lookups', result='hit')
+    # Topics cached before the index existed join it as they are used
+    get_topic_index().add(subject, topic)
+    return _shared.setdefault(key, StudyMaterials.from_dict(data))
+
+def _load_similar(subject, topic, version, model_name):
+    """``(TopicMatch, materials)`` for a cached topic close enough to stand in for this one"""
+    telemetry = get_telemetry()
+    with telemetry.span('topic_lookup'):
+        match = get_topic_index().find(subject, topic)
+    if match is None or (normalize_key(match.subject), normalize_key(match.topic)) == (
+            normalize_key(subject), normalize_key(topic)):
+        return None, None
+    materials = _load_cached(match.subject, match.topic, version, model_name)
+    # The match may have been evicted since, or cached only for another prompt version or model
+    telemetry.incr('topic_matches', result='miss' if materials is None else 'hit')
+    return (None, None) if materials is None else (match, materials)
+
+def _lookup(subject, topic, version, model_name, exact=False):
+    """``(match, materials)`` from the cache, trying close matches after the exact topic unless ``exact``"""
+    materials = _load_cached(subject, topic, version, model_name)
+    if materials is not None or exact:
+        return None, materials
+    return _load_similar(subject, topic, version, model_name)
+
+def _cached_events(subject, topic, version, model_name, exact=False):
+    """Stream events serving the cached materials, or None on a miss"""
+    match, materials = _lookup(subject, topic, version, model_name, exact)
+    if materials is None:
+        return None
+    return ([('match', match)] if match is not None else []) + [(None, materials)]
+
+def _materials_version():
+    """Cache version of whole materials in the current generation mode"""
+    return SECTION_PROMPT_VERSION if GENERATION_MODE == 'sectioned' else PROMPT_VERSION
+
+def _store(subject, topic, version, model_name, materials):
+    # Don't persist the empty fallback returned when parsing fails
+    if materials.has_items():
+        _shared[make_key(subject, topic, version, model_name)] = materials
+        get_cache().set(subject, topic, version, model_name, materials.to_dict())
+        get_topic_index().add(subject, topic)
+
+def _generate_section(model, subject, topic, section, priority=INTERACTIVE, fresh=False):
+    """Generate one section, retrying only that section on errors or bad output"""
+    cache = get_cache()
+    telemetry = get_telemetry()
+    prompt = build_prompt(subject, topic, sections=(section,))
+    name = _cache_name(model)
+    if not fresh:
+        with telemetry.span('cache_lookup'):
+            cached = cache.get(subject, topic, prompt.version, name)
+        telemetry.incr('cache_lookups', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            return cached[section]
     
-    for model_name in model_names:
+    error = None
+    for attempt in range(SECTION_RETRIES + 1):
+        if attempt:
+            telemetry.incr('section_retries', section=section)
         try:
-            model = genai.GenerativeModel(model_name)
-            # Simple connection test
-            # We skip the "Say TEST OK" call to save latency, trusting the configuration works
-            # if the object creation succeeded.
-            return model
-        except Exception:
+            response = call_model(model, prompt, priority, EXPECTED_OUTPUT_TOKENS // len(SECTIONS))
+            value = parse_section(response.text, section)
+        except Exception as e:
+            error = e
             continue
+        if value is not None:
+            cache.set(subject, topic, prompt.version, name, {section: value})
+            return value
+        error = ValueError(f"Malformed {section} response")
+    raise error
+
+def iter_sections(model, subject, topic, max_workers=MAX_CONCURRENCY, priority=INTERACTIVE, sections=SECTIONS,
+                  fresh=False):
+    """Generate sections concurrently, yielding ``(section, value, error)`` as each finishes"""
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            # Each task runs in a copy of the caller's context so its spans join the caller's trace
+            executor.submit(contextvars.copy_context().run, _generate_section,
+                            model, subject, topic, section, priority, fresh): section
+            for section in sections
+        }
+        for future in as_completed(futures):
+            section = futures[future]
+            try:
+                yield section, future.result(), None
+            except Exception as e:
+                yield section, ('' if section == 'summary' else []), e
+
+def _fill_missing(model, subject, topic, result, priority=INTERACTIVE, fresh=False):
+    """Re-request only the sections a parsed response had nothing usable for"""
+    materials = result.materials
+    if not result.missing:
+        return materials
+    logger.warning("Response was incomplete, regenerating: %s", ', '.join(result.missing))
+    updates = {}
+    for section, value, error in iter_sections(model, subject, topic, priority=priority, sections=result.missing,
+                                               fresh=fresh):
+        if error is None:
+            updates[section] = section_value(section, value)
+    materials = dataclasses.replace(materials, **updates)
+    if not (materials.summary or materials.has_items()):
+        materials = dataclasses.replace(materials, summary=PARSE_ERROR_SUMMARY)
+    return materials
+
+def _typed_events(events):
+    """Convert raw parser events into summary text and typed items"""
+    for section, item in events:
+        if section == 'summary':
+            yield section, section_value(section, item)
+        elif section in ITEM_TYPES and isinstance(item, dict):
+            yield section, ITEM_TYPES[section].from_dict(item)
+
+def stream_sectioned(model, subject, topic, max_workers=MAX_CONCURRENCY, priority=INTERACTIVE, fresh=False,
+                     exact=False):
+    """Sectioned counterpart of stream_study_material; sections arrive whole as they finish"""
+    name = _cache_name(model)
+    events = None if fresh else _cached_events(subject, topic, SECTION_PROMPT_VERSION, name, exact)
+    if events:
+        yield from events
+        return
     
-    st.error("❌ No compatible Gemini model found.")
-    return None
+    with get_flights().hold(make_key(subject, topic, SECTION_PROMPT_VERSION, name)) as waited:
+        if waited:
+            cached = _load_cached(subject, topic, SECTION_PROMPT_VERSION, name)
+            if cached is not None:
+                yield None, cached
+                return
+        
+        values = {}
+        failed = []
+        for section, value, error in iter_sections(model, subject, topic, max_workers, priority, fresh=fresh):
+            values[section] = value = section_value(section, value)
+            if error is not None:
+                failed.append(f"{section} ({error})")
+            elif section == 'summary':
+                yield section, value
+            else:
+                for item in value:
+                    yield section, item
+        materials = StudyMaterials(**values)
+        if failed:
+            get_telemetry().incr('generation_failures', len(failed), mode='sectioned')
+            if len(failed) == len(SECTIONS):
+                raise GenerationError(f"Error generating content: {', '.join(failed)}")
+            # Partial materials are still returned, just not cached
+            logger.warning("Error generating content: %s", ', '.join(failed))
+        else:
+            _store(subject, topic, SECTION_PROMPT_VERSION, name, materials)
+    yield None, materials
+
+def generate_sectioned(model, subject, topic, max_workers=MAX_CONCURRENCY, priority=INTERACTIVE, fresh=False,
+                       exact=False):
+    """Fan out one request per section and merge them into StudyMaterials"""
+    for section, item in stream_sectioned(model, subject, topic, max_workers, priority, fresh, exact):
+        if section is None:
+            return item
+    raise GenerationError("Generation ended without materials")
+
+def build_study_material(subject, topic, priority=INTERACTIVE, fresh=False, exact=False):
+    """Generate comprehensive study materials using Gemini, through the shared caches.
+
+    A close match of an earlier topic (see topic_index) is served from the
+    cache too, unless ``exact`` is set, which only takes materials cached
+    for this topic itself, or ``fresh``, which always generates anew.
+    StudyMaterials is immutable, so every caller in the process gets the
+    same instance. Raises ConfigurationError or GenerationError on failure.
+    """
+    with get_telemetry().span('generate', mode=GENERATION_MODE, streamed=False):
+        return _build_study_material(subject, topic, priority, fresh, exact)
+
+# Kept for callers of the original API
+generate_study_material = build_study_material
 
-@st.cache_data(show_spinner=False)
-def generate_study_material(subject, topic):
-    """Generate comprehensive study materials using Gemini with caching"""
+def _build_study_material(subject, topic, priority, fresh, exact):
     model = configure_gemini()
-    if model is None:
-        return None
+    if GENERATION_MODE == 'sectioned':
+        return generate_sectioned(model, subject, topic, priority=priority, fresh=fresh, exact=exact)
     
-    prompt = f"""
-    Create comprehensive study materials for:
-    SUBJECT: {subject}
-    TOPIC: {topic}
+    # Shared on-disk cache survives restarts and is visible to every worker
+    name = _cache_name(model)
+    if not fresh:
+        _, cached = _lookup(subject, topic, PROMPT_VERSION, name, exact)
+        if cached is not None:
+            return cached
     
-    Return the response in EXACTLY this JSON format:
-    {{
-        "summary": "Detailed summary of the topic (4-6 paragraphs covering all important aspects)",
-        "flashcards": [
-            {{"question": "question1", "answer": "detailed answer1"}},
-            {{"question": "question2", "answer": "detailed answer2"}},
-            {{"question": "question3", "answer": "detailed answer3"}},
-            {{"question": "question4", "answer": "detailed answer4"}},
-            {{"question": "question5", "answer": "detailed answer5"}},
-            {{"question": "question6", "answer": "detailed answer6"}},
-            {{"question": "question7", "answer": "detailed answer7"}},
-            {{"question": "question8", "answer": "detailed answer8"}},
-            {{"question": "question9", "answer": "detailed answer9"}},
-            {{"question": "question10", "answer": "detailed answer10"}},
-            {{"question": "question11", "answer": "detailed answer11"}},
-            {{"question": "question12", "answer": "detailed answer12"}},
-            {{"question": "question13", "answer": "detailed answer13"}},
-            {{"question": "question14", "answer": "detailed answer14"}},
-            {{"question": "question15", "answer": "detailed answer15"}}
-        ],
-        "mcqs": [
-            {{
-                "question": "question1",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "A) option1",
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question2",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "B) option2", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question3",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "C) option3", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question4",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "D) option4", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question5",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "A) option1", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question6",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "B) option2", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question7",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "C) option3", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question8",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "D) option4", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question9",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "A) option1", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question10",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "B) option2", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question11",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "C) option3", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }},
-            {{
-                "question": "question12",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "D) option4", 
-                "explanation": "Detailed explanation of why this is correct and others are wrong"
-            }}
-        ],
-        "hard_terms": [
-            {{"term": "term1", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term2", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term3", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term4", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term5", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term6", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term7", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term8", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term9", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term10", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term11", "explanation": "comprehensive explanation with examples"}},
-            {{"term": "term12", "explanation": "comprehensive explanation with examples"}}
-        ],
-        "example_problems": [
-            {{
-                "problem": "detailed problem statement 1",
-                "solution": "comprehensive step-by-step solution",
-                "explanation": "detailed explanation of why this approach works and key concepts"
-            }},
-            {{
-                "problem": "detailed problem statement 2", 
-                "solution": "comprehensive step-by-step solution",
-                "explanation": "detailed explanation of why this approach works and key concepts"
-            }},
-            {{
-                "problem": "detailed problem statement 3",
-                "solution": "comprehensive step-by-step solution",
-                "explanation": "detailed explanation of why this approach works and key concepts"
-            }}
-        ]
-    }}
+    # Identical concurrent requests wait for the first one and then hit the cache
+    with get_flights().hold(make_key(subject, topic, PROMPT_VERSION, name)) as waited:
+        if waited:
+            cached = _load_cached(subject, topic, PROMPT_VERSION, name)
+            if cached is not None:
+                return cached
+        
+        try:
+            response = call_model(model, build_prompt(subject, topic), priority)
+            materials = _fill_missing(model, subject, topic, parse_materials(response.text), priority, fresh)
+        except Exception as e:
+            get_telemetry().incr('generation_failures', mode='single', error=type(e).__name__)
+            raise GenerationError(f"Error generating content: {str(e)}") from e
+        
+        _store(subject, topic, PROMPT_VERSION, name, materials)
+    return materials
+
+def stream_study_material(subject, topic, priority=INTERACTIVE, fresh=False):
+    """Stream study materials, yielding items as soon as Gemini produces them.
+
+    Yields ``(section, item)`` pairs while the response arrives, with the
+    summary as text and list items as their model types. The last pair has
+    ``section`` set to None and carries the complete StudyMaterials. When
+    the materials of a close match are served instead, a ``('match',
+    TopicMatch)`` pair comes first; ``fresh`` skips the cache entirely.
+    Raises ConfigurationError or GenerationError (after any items already
+    yielded) if generation fails.
+    """
+    with get_telemetry().span('generate', mode=GENERATION_MODE, streamed=True):
+        yield from _stream_study_material(subject, topic, priority, fresh)
+
+def _stream_study_material(subject, topic, priority, fresh):
+    model = configure_gemini()
+    if GENERATION_MODE == 'sectioned':
+        yield from stream_sectioned(model, subject, topic, priority=priority, fresh=fresh)
+        return
     
-    IMPORTANT REQUIREMENTS:
-    - Generate AT LEAST 12 MCQs (multiple choice questions)
-    - Generate AT LEAST 15 flashcards
-    - Generate AT LEAST 12 hard terms with explanations
-    - Generate AT LEAST 3 example problems
-    - Make all content comprehensive, detailed, and educational
-    - Ensure MCQs cover different aspects of the topic
-    - Provide detailed explanations for MCQ answers
-    - Make flashcards cover fundamental concepts
-    - Ensure hard terms include key terminology from the topic
-    - Make example problems practical and illustrative
+    name = _cache_name(model)
+    events = None if fresh else _cached_events(subject, topic, PROMPT_VERSION, name)
+    if events:
+        yield from events
+        return
     
-    Provide accurate and educational content suitable for students.
-    Make the content engaging and informative.
+    with get_flights().hold(make_key(subject, topic, PROMPT_VERSION, name)) as waited:
+        if waited:
+            cached = _load_cached(subject, topic, PROMPT_VERSION, name)
+            if cached is not None:
+                yield None, cached
+                return
+        
+        parser = IncrementalParser()
+        chunks = []
+        try:
+            start = time.perf_counter()
+            response = call_model(model, build_prompt(subject, topic), priority, stream=True)
+            for chunk in _timed_chunks(response, start):
+                chunks.append(chunk.text)
+                yield from _typed_events(parser.feed(chunk.text))
+        except Exception as e:
+            get_telemetry().incr('generation_failures', mode='streamed', error=type(e).__name__)
+            raise GenerationError(f"Error generating content: {str(e)}") from e
+        
+        # Validate the whole response and re-request any section that didn't make it
+        materials = _fill_missing(model, subject, topic, parse_materials(''.join(chunks)), priority, fresh)
+        _store(subject, topic, PROMPT_VERSION, name, materials)
+    yield None, materials
+
+def extend_materials(subject, topic, section, count=5, priority=INTERACTIVE):
+    """Add ``count`` new items to one list section of a topic's cached materials.
+
+    The materials are read from the cache, never taken from the caller,
+    and extensions of one topic run one at a time so each builds on the
+    last. Only the new items are requested, with the existing ones listed
+    in the prompt so the model avoids them; any that still repeat an item
+    (by fingerprint) are dropped. The extended materials replace the cache
+    entry and are returned. Raises NotCachedError if the topic isn't
+    cached, or GenerationError if no new item could be generated.
     """
-    
-    try:
-        response = model.generate_content(prompt)
-        return parse_response(response.text)
-    except Exception as e:
-        st.error(f"Error generating content: {str(e)}")
-        return None
+    if section not in ITEM_TYPES:
+        raise ValueError(f"Cannot extend {section!r}; expected one of {', '.join(ITEM_TYPES)}")
+    telemetry = get_telemetry()
+    with telemetry.span('extend', section=section):
+        model = configure_gemini()
+        name = _cache_name(model)
+        version = _materials_version()
+        with get_flights().hold(make_key(subject, topic, version, name) + '\x1fextend'):
+            materials = _load_cached(subject, topic, version, name)
+            if materials is None:
+                raise NotCachedError(f"No cached materials for {topic} ({subject}); generate them first")
+            existing = getattr(materials, section)
+            seen = {item.fingerprint() for item in existing}
+            prompt = build_extension_prompt(subject, topic, section, count, [item.key for item in existing])
+            added = []
+            error = None
+            for attempt in range(SECTION_RETRIES + 1):
+                if attempt:
+                    telemetry.incr('section_retries', section=section)
+                try:
+                    response = call_model(model, prompt, priority, EXPECTED_OUTPUT_TOKENS // len(SECTIONS))
+                    value = parse_section(response.text, section)
+                except Exception as e:
+                    error = e
+                    continue
+                for item in section_value(section, value):
+                    fingerprint = item.fingerprint()
+                    if fingerprint in seen:
+                        telemetry.incr('duplicates_dropped', section=section)
+                    elif len(added) < count:
+                        seen.add(fingerprint)
+                        added.append(item)
+                if added:
+                    break
+                error = ValueError(f"No new {section} in the response")
+            if not added:
+                telemetry.incr('generation_failures', mode='extend', error=type(error).__name__)
+                raise GenerationError(f"Error generating more {section.replace('_', ' ')}: {error}")
+
+            materials = dataclasses.replace(materials, **{section: existing + tuple(added)})
+            _store(subject, topic, version, name, materials)
+    return materials
+
+def cached_study_material(subject, topic, exact=False):
+    """Cached materials for a topic or (unless ``exact``) a close match, or None; never generates"""
+    model = configure_gemini()
+    return _lookup(subject, topic, _materials_version(), _cache_name(model), exact)[1]
@@ -1,86 +1,350 @@
+import copy
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from fpdf import FPDF
-import tempfile
+from fontTools import ttLib
+from fpdf.enums import XPos, YPos
+try:
+    from fpdf.fonts import SubsetMap
+except ImportError:  # fpdf2 before 2.7.x; fonts are added with add_font instead
+    SubsetMap = None
+from app.utils.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the layout below changes so cached PDFs are re-rendered
+PDF_TEMPLATE_VERSION = '3'
+PDF_CACHE_SIZE = int(os.getenv('STUDYMATE_PDF_CACHE_SIZE', '32'))
+
+# Unicode TTF font used for the guide; the core PDF fonts only cover latin-1
+FONT_FAMILY = 'DejaVu'
+FONT_FILES = {
+    '': 'DejaVuSans.ttf',
+    'B': 'DejaVuSans-Bold.ttf',
+    'I': 'DejaVuSans-Oblique.ttf',
+    'BI': 'DejaVuSans-BoldOblique.ttf',
+}
+FONT_DIRS = [
+    os.getenv('STUDYMATE_PDF_FONT_DIR', ''),
+    '/usr/share/fonts/truetype/dejavu',
+    '/usr/share/fonts/dejavu',
+    '/usr/local/share/fonts',
+    '/Library/Fonts',
+    os.path.expanduser('~/Library/Fonts'),
+    r'C:\Windows\Fonts',
+]
+
+_font_templates = None
+_font_lock = threading.Lock()
+
+
+def _load_font_templates():
+    """Parse the TTF fonts once per process.
+
+    Parsing a TTF costs tens of milliseconds per style, so each document gets a
+    copy of these parsed fonts instead of calling ``add_font`` again. Maps
+    each style to its file path and parsed font.
+    """
+    global _font_templates
+    with _font_lock:
+        if _font_templates is None:
+            _font_templates = {}
+            for font_dir in FONT_DIRS:
+                regular = os.path.join(font_dir, FONT_FILES['']) if font_dir else ''
+                if regular and os.path.exists(regular):
+                    loader = FPDF()
+                    for style, filename in FONT_FILES.items():
+                        path = os.path.join(font_dir, filename)
+                        if os.path.exists(path):
+                            loader.add_font(FONT_FAMILY, style, path)
+                            _font_templates[style] = (path, loader.fonts[f"{FONT_FAMILY.lower()}{style}"])
+                    break
+            if not _font_templates:
+                logger.warning("DejaVuSans.ttf not found; PDFs will show non-Latin characters as '?'. "
+                               "Install DejaVu fonts or set STUDYMATE_PDF_FONT_DIR.")
+        return _font_templates
+
+
+def _clone_font(template):
+    """Per-document copy of a parsed font.
+
+    The glyph widths and character maps are read-only and shared; the
+    fontTools handle and glyph subset are per document because embedding
+    the font subsets it in place. This relies on fpdf2's font internals,
+    so requirements.txt keeps fpdf2 to the 2.8 series (2.8.6 on) this was
+    checked against; StudyGuidePDF falls back to ``add_font`` if a field
+    goes missing, but per-document state a new release adds would be
+    shared between documents.
+    """
+    font = copy.copy(template)
+    font.ttfont = ttLib.TTFont(template.ttffile, recalcTimestamp=False, lazy=True)
+    font.subset = SubsetMap(font)
+    font.missing_glyphs = []
+    font.biggest_size_pt = 0
+    font._hbfont = None
+    return font
+
+
+def _latin1(text):
+    # Core fonts can only draw latin-1, so replace anything else once up front
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
 
 class StudyGuidePDF(FPDF):
+    def __init__(self):
+        super().__init__()
+        self._widths = {}
+        self.styles = set()
+        for style, (path, template) in _load_font_templates().items():
+            try:
+                font = _clone_font(template)
+            except (AttributeError, TypeError):
+                # Font internals of another fpdf2 release: parse the file again instead
+                self.add_font(FONT_FAMILY, style, path)
+            else:
+                font.i = len(self.fonts) + 1
+                self.fonts[font.fontkey] = font
+            self.styles.add(style)
+        self.unicode = '' in self.styles
+        self.family = FONT_FAMILY if self.unicode else 'helvetica'
+
+    def use_font(self, style='', size=11):
+        # Fall back to the regular face when a style's TTF isn't installed
+        if self.unicode and style not in self.styles:
+            style = ''
+        self.set_font(self.family, style, size)
+
+    def clean(self, value):
+        """Text safe to draw with the current font"""
+        value = str(value)
+        return value if self.unicode else _latin1(value)
+
+    def text_line(self, text, h=5, style='', size=11, align='L'):
+        self.use_font(style, size)
+        self.cell(0, h, self.clean(text), align=align, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    def text_width(self, word):
+        key = (self.font_family, self.font_style, self.font_size_pt, word)
+        width = self._widths.get(key)
+        if width is None:
+            width = self._widths[key] = self.get_string_width(word)
+        return width
+
+    def text_block(self, text, h=5, style='', size=11):
+        """Word-wrap text into lines at the left margin.
+
+        Wrapping here with cached word widths is linear in the text length,
+        whereas multi_cell re-measures the whole line for every character.
+        """
+        self.use_font(style, size)
+        width = self.epw - 2 * self.c_margin
+        space = self.text_width(' ')
+        for paragraph in self.clean(text).split('\n'):
+            line = []
+            line_width = 0
+            for word in paragraph.split(' '):
+                word_width = self.text_width(word)
+                if word_width > width:
+                    # Only multi_cell can split a single overlong word
+                    if line:
+                        self.cell(0, h, ' '.join(line), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+                    self.multi_cell(0, h, word, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+                    line, line_width = [], 0
+                elif line and line_width + space + word_width > width:
+                    self.cell(0, h, ' '.join(line), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+                    line, line_width = [word], word_width
+                else:
+                    line_width += word_width + (space if line else 0)
+                    line.append(word)
+            self.cell(0, h, ' '.join(line), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
     def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(0, 10, 'Study Mate - AI Study Guide', 0, 1, 'C')
+        self.text_line('Study Mate - AI Study Guide', h=10, style='B', size=15, align='C')
         self.ln(10)
 
     def footer(self):
         self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+        self.use_font('I', 8)
+        self.cell(0, 10, f'Page {self.page_no()}', align='C')
 
     def chapter_title(self, title):
-        self.set_font('Arial', 'B', 12)
+        self.use_font('B', 12)
         self.set_fill_color(200, 220, 255)
-        self.cell(0, 6, title, 0, 1, 'L', 1)
+        self.cell(0, 6, self.clean(title), fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         self.ln(4)
 
     def chapter_body(self, body):
-        self.set_font('Arial', '', 11)
-        # Encode to latin-1 to avoid utf-8 issues with standard fpdf, usually better to use replacement chars
-        # Or better: use a font that supports unicode. For simplicity, we'll try to handle basic text.
-        try:
-             self.multi_cell(0, 5, body)
-        except:
-             # Fallback cleanup for unsupported chars
-             cleaned = body.encode('latin-1', 'replace').decode('latin-1')
-             self.multi_cell(0, 5, cleaned)
+        self.text_block(body)
         self.ln()
 
-def generate_pdf(subject, topic, materials):
+
+def generate_pdf(subject, topic, materials, output=None):
+    """Render the study guide; returns bytes, or writes into ``output`` if a file object is given"""
+    with get_telemetry().span('pdf_render'):
+        return _render_pdf(subject, topic, materials, output)
+
+
+def _render_pdf(subject, topic, materials, output):
     pdf = StudyGuidePDF()
     pdf.add_page()
     
     # Title
-    pdf.set_font('Arial', 'B', 16)
-    pdf.cell(0, 10, f"Subject: {subject}", 0, 1)
-    pdf.set_font('Arial', 'I', 14)
-    pdf.cell(0, 10, f"Topic: {topic}", 0, 1)
+    pdf.text_line(f"Subject: {subject}", h=10, style='B', size=16)
+    pdf.text_line(f"Topic: {topic}", h=10, style='I', size=14)
     pdf.ln(10)
     
     # Summary
-    if materials.get('summary'):
+    if materials.summary:
         pdf.chapter_title("Summary")
-        pdf.chapter_body(materials['summary'])
+        pdf.chapter_body(materials.summary)
     
     # Key Terms
-    if materials.get('hard_terms'):
+    if materials.hard_terms:
         pdf.chapter_title("Key Terms")
-        for term in materials['hard_terms']:
-            pdf.set_font('Arial', 'B', 11)
-            pdf.cell(0, 5, f"- {term.get('term', '')}", 0, 1)
-            pdf.set_font('Arial', '', 11)
-            pdf.multi_cell(0, 5, f"  {term.get('explanation', '')}")
+        for term in materials.hard_terms:
+            pdf.text_line(f"- {term.term}", style='B')
+            pdf.text_block(f"  {term.explanation}")
             pdf.ln(2)
         pdf.ln(5)
 
     # Flashcards
-    if materials.get('flashcards'):
+    if materials.flashcards:
         pdf.chapter_title("Flashcards (Q&A)")
-        for i, card in enumerate(materials['flashcards'], 1):
-            pdf.set_font('Arial', 'B', 11)
-            pdf.multi_cell(0, 5, f"Q{i}: {card.get('question', '')}")
-            pdf.set_font('Arial', '', 11)
-            pdf.multi_cell(0, 5, f"A: {card.get('answer', '')}")
+        for i, card in enumerate(materials.flashcards, 1):
+            pdf.text_block(f"Q{i}: {card.question}", style='B')
+            pdf.text_block(f"A: {card.answer}")
             pdf.ln(3)
 
     # MCQs
-    if materials.get('mcqs'):
+    if materials.mcqs:
         pdf.chapter_title("Multiple Choice Questions")
-        for i, mcq in enumerate(materials['mcqs'], 1):
-            pdf.set_font('Arial', 'B', 11)
-            pdf.multi_cell(0, 5, f"{i}. {mcq.get('question', '')}")
+        for i, mcq in enumerate(materials.mcqs, 1):
+            pdf.text_block(f"{i}. {mcq.question}", style='B')
             
-            pdf.set_font('Arial', '', 10)
-            for opt in mcq.get('options', []):
-                 pdf.cell(0, 5, f"   {opt}", 0, 1)
+            for opt in mcq.options:
+                pdf.text_line(f"   {opt}", size=10)
             
             pdf.ln(1)
-            pdf.set_font('Arial', 'I', 10)
-            pdf.multi_cell(0, 5, f"   Answer: {mcq.get('correct_answer', '')}")
+            pdf.text_block(f"   Answer: {mcq.correct_answer}", style='I', size=10)
+            if mcq.explanation:
+                pdf.text_block(f"   Explanation: {mcq.explanation}", size=10)
+            pdf.ln(3)
+
+    # Example Problems
+    if materials.example_problems:
+        pdf.chapter_title("Example Problems")
+        for i, example in enumerate(materials.example_problems, 1):
+            pdf.text_block(f"Example {i}: {example.problem}", style='B')
+            pdf.text_block("Solution:", style='I', size=10)
+            pdf.text_block(example.solution, size=10)
+            if example.explanation:
+                pdf.text_block(f"Explanation: {example.explanation}", size=10)
             pdf.ln(3)
 
-    return pdf.output(dest='S').encode('latin-1', 'replace') # Return as bytes for streamlit download
+    if output is not None:
+        pdf.output(output)
+        return None
+    # fpdf2 already returns the encoded document; no second encoding pass needed
+    return bytes(pdf.output())
+
+
+class PDFCache:
+    """Bounded LRU of rendered PDFs keyed by their (hashable) content.
+
+    Renders can also be queued on a background worker so the PDF is ready
+    by the time the user asks for it; requests for a PDF that is already
+    rendering wait for that render instead of starting another one.
+    """
+
+    def __init__(self, max_entries=PDF_CACHE_SIZE, workers=1):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf')
+
+    @staticmethod
+    def digest(subject, topic, materials):
+        # StudyMaterials is frozen, so it can key the cache directly instead of
+        # serializing it; the shared instance also makes equality checks cheap
+        return (PDF_TEMPLATE_VERSION, subject, topic, materials)
+
+    def peek(self, subject, topic, materials):
+        """Return the PDF if it is already rendered, without rendering it"""
+        key = self.digest(subject, topic, materials)
+        with self._lock:
+            pdf_bytes = self._entries.get(key)
+            if pdf_bytes is not None:
+                self._entries.move_to_end(key)
+            return pdf_bytes
+
+    def get(self, subject, topic, materials):
+        """Return the PDF, rendering it (or waiting for a background render) if needed"""
+        key = self.digest(subject, topic, materials)
+        with self._lock:
+            pdf_bytes = self._entries.get(key)
+            if pdf_bytes is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pdf_bytes
+            self.misses += 1
+            future = self._pending.get(key)
+        if future is not None:
+            return future.result()
+        return self._render(key, subject, topic, materials)
+
+    def prefetch(self, subject, topic, materials):
+        """Render the PDF on the background worker unless it is cached or already queued"""
+        key = self.digest(subject, topic, materials)
+        with self._lock:
+            if key in self._entries or key in self._pending:
+                return
+            self._pending[key] = self._executor.submit(self._render, key, subject, topic, materials)
+
+    def _render(self, key, subject, topic, materials):
+        try:
+            pdf_bytes = generate_pdf(subject, topic, materials)
+        except Exception:
+            with self._lock:
+                self._pending.pop(key, None)
+            raise
+        with self._lock:
+            self._entries[key] = pdf_bytes
+            self._entries.move_to_end(key)
+            self._pending.pop(key, None)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return pdf_bytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'pending': len(self._pending),
+            }
+
+
+_pdf_cache = PDFCache()
+get_telemetry().register('pdf_cache', _pdf_cache.stats)
+
+
+def get_pdf(subject, topic, materials):
+    """Memoized generate_pdf"""
+    return _pdf_cache.get(subject, topic, materials)
+
+
+def peek_pdf(subject, topic, materials):
+    """Cached PDF bytes, or None if the PDF hasn't been rendered yet"""
+    return _pdf_cache.peek(subject, topic, materials)
+
+
+def prefetch_pdf(subject, topic, materials):
+    """Start rendering the PDF in the background"""
+    _pdf_cache.prefetch(subject, topic, materials)
@@ -0,0 +1,160 @@
+import os
+import threading
+from collections import namedtuple
+
+from app.services.scheduler import estimate_tokens
+from app.utils.parsers import SECTIONS
+from app.utils.telemetry import get_telemetry
+
+# Bump whenever the prompt text below changes so cached materials are regenerated
+PROMPT_VERSION = '2'
+
+# Items requested per list section unless the caller asks for other counts
+DEFAULT_COUNTS = {
+    'flashcards': 15,
+    'mcqs': 12,
+    'hard_terms': 12,
+    'example_problems': 3,
+}
+
+# Audience line for each difficulty level
+DIFFICULTIES = {
+    'introductory': 'beginners; define every term and avoid jargon',
+    'intermediate': 'students',
+    'advanced': 'advanced students; include derivations, edge cases and common pitfalls',
+}
+DEFAULT_DIFFICULTY = 'intermediate'
+
+# Compact shape and requirement for each section. One schema line per section
+# replaces the dozens of placeholder objects the prompt used to spell out.
+SECTION_SPECS = {
+    'summary': ('string', '4-6 paragraphs covering all important aspects'),
+    'flashcards': ('{"question", "answer"}', 'fundamental concepts, detailed answers'),
+    'mcqs': (
+        '{"question", "options": ["A) ..", "B) ..", "C) ..", "D) .."], '
+        '"correct_answer": one of the options verbatim, "explanation": why it is right and the others wrong}',
+        'cover different aspects of the topic',
+    ),
+    'hard_terms': ('{"term", "explanation"}', 'key terminology, explained comprehensively with examples'),
+    'example_problems': (
+        '{"problem", "solution": step-by-step, "explanation": why the approach works}',
+        'practical and illustrative',
+    ),
+}
+
+# Ask for application/json responses on models that support it (no fences or chatter to strip)
+JSON_MODE = os.getenv('STUDYMATE_JSON_MODE', '1') != '0'
+
+# Characters of each existing item quoted when asking for more items
+EXISTING_ITEM_CHARS = 120
+
+Prompt = namedtuple('Prompt', 'text version input_tokens')
+
+
+def resolve_counts(counts=None):
+    """DEFAULT_COUNTS with any per-section overrides applied"""
+    return {**DEFAULT_COUNTS, **(counts or {})}
+
+
+def prompt_version(sections=SECTIONS, counts=None, difficulty=DEFAULT_DIFFICULTY):
+    """Cache version for a prompt; differs whenever the prompt asks for something different"""
+    version = PROMPT_VERSION
+    if tuple(sections) != SECTIONS:
+        version += '/' + '+'.join(sections)
+    counts = resolve_counts(counts)
+    params = [f'{section}={counts[section]}' for section in sections
+              if section in counts and counts[section] != DEFAULT_COUNTS[section]]
+    if difficulty != DEFAULT_DIFFICULTY:
+        params.append(difficulty)
+    if params:
+        version += ':' + ','.join(params)
+    return version
+
+
+def build_prompt(subject, topic, sections=SECTIONS, counts=None, difficulty=DEFAULT_DIFFICULTY):
+    """Build a compact study-material prompt for some or all sections"""
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f"Unknown difficulty {difficulty!r}; expected one of {', '.join(DIFFICULTIES)}")
+    counts = resolve_counts(counts)
+    lines = []
+    for section in sections:
+        shape, requirement = SECTION_SPECS[section]
+        if section == 'summary':
+            lines.append(f'"summary": {shape}; {requirement}')
+        else:
+            lines.append(f'"{section}": list of at least {counts[section]} {shape}; {requirement}')
+    schema = '\n'.join(lines)
+    text = f"""Create study materials for {DIFFICULTIES[difficulty]}.
+SUBJECT: {subject}
+TOPIC: {topic}
+
+Reply with only a JSON object with these keys:
+{schema}
+
+Make all content accurate, detailed and educational."""
+    return Prompt(text, prompt_version(sections, counts, difficulty), estimate_tokens(text))
+
+
+def build_extension_prompt(subject, topic, section, count, existing=(), difficulty=DEFAULT_DIFFICULTY):
+    """Prompt for ``count`` more items of one list section, unlike the ``existing`` ones (their key texts)"""
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f"Unknown difficulty {difficulty!r}; expected one of {', '.join(DIFFICULTIES)}")
+    shape, requirement = SECTION_SPECS[section]
+    name = section.replace('_', ' ')
+    # Key texts only, shortened: enough for the model to tell what is already covered
+    listed = ''.join(f'\n- {text[:EXISTING_ITEM_CHARS]}' for text in existing)
+    text = f"""Create more study materials for {DIFFICULTIES[difficulty]}.
+SUBJECT: {subject}
+TOPIC: {topic}
+
+The materials already have {len(existing)} {name}. Cover points none of these do:{listed}
+
+Reply with only a JSON object with this key:
+"{section}": list of {count} new {shape}; {requirement}"""
+    version = prompt_version((section,), {section: count}, difficulty) + '+more'
+    return Prompt(text, version, estimate_tokens(text))
+
+
+def generation_config():
+    """Extra generation_config for Gemini requests, or None"""
+    if JSON_MODE:
+        return {'response_mime_type': 'application/json'}
+    return None
+
+
+class PromptUsage:
+    """Input tokens sent per request, using the SDK's count when it reports one"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.input_tokens = 0
+        self.last_input_tokens = 0
+
+    def record(self, estimated, actual=None):
+        tokens = actual if actual is not None else estimated
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += tokens
+            self.last_input_tokens = tokens
+        return tokens
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'input_tokens': self.input_tokens,
+                'avg_input_tokens': self.input_tokens / self.requests if self.requests else 0.0,
+                'last_input_tokens': self.last_input_tokens,
+            }
+
+
+_usage = PromptUsage()
+
+
+def get_prompt_usage():
+    """Process-wide input token tally"""
+    return _usage
+
+
+get_telemetry().register('prompts', _usage.stats)
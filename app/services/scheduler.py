@@ -0,0 +1,190 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+from app.utils.telemetry import get_telemetry
+
+# Lower numbers are dispatched first
+INTERACTIVE = 0
+BATCH = 10
+
+# Exception class names the Gemini SDK (google.api_core) uses for transient failures
+RETRYABLE_ERRORS = {
+    'ResourceExhausted',
+    'TooManyRequests',
+    'ServiceUnavailable',
+    'DeadlineExceeded',
+    'InternalServerError',
+}
+
+
+def is_retryable(error):
+    """True for quota and transient server errors worth retrying"""
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    message = str(error).lower()
+    return '429' in message or 'quota' in message or 'rate limit' in message
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate_per_minute``"""
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount):
+        """Seconds until ``amount`` tokens are available (0 if they are now)"""
+        self._refill()
+        # Never wait on more than a full bucket, or oversized requests would starve
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self._refill()
+        self.tokens -= amount
+
+
+class RequestScheduler:
+    """Priority queue in front of the model with requests- and tokens-per-minute budgets.
+
+    Callers block in ``run`` until their request reaches the head of the
+    queue and both budgets allow it, then the call is made on the caller's
+    thread. Quota and transient errors are retried with jittered exponential
+    backoff. A call that makes several API requests (such as a model pool
+    failing over) takes another permit with ``acquire`` for each extra one.
+    ``clock``, ``sleep`` and ``rng`` can be swapped out in tests.
+    """
+
+    def __init__(self, rpm=60, tpm=1_000_000, max_retries=4, base_delay=1.0, max_delay=30.0,
+                 clock=time.monotonic, sleep=time.sleep, rng=random.random):
+        self.requests = TokenBucket(rpm, clock=clock)
+        self.token_budget = TokenBucket(tpm, clock=clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._sleep = sleep
+        self._rng = rng
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self.dispatched = 0
+        self.retries = 0
+        self.failures = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_queue_depth = 0
+
+    def run(self, fn, tokens=1, priority=INTERACTIVE):
+        """Run ``fn`` once the budgets allow it, retrying retryable errors"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens, priority)
+            try:
+                return fn()
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    with self._cond:
+                        self.failures += 1
+                    raise
+                with self._cond:
+                    self.retries += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                self._sleep(delay * (0.5 + self._rng() / 2))
+
+    def record_usage(self, estimated, actual):
+        """Correct the token budget once the real usage of a request is known"""
+        with self._cond:
+            self.token_budget.consume(actual - estimated)
+
+    def acquire(self, tokens=1, priority=INTERACTIVE):
+        """Block until one request of ``tokens`` fits the budgets, and count it against them"""
+        ticket = (priority, next(self._sequence))
+        enqueued = self._clock()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            while True:
+                if self._queue[0] != ticket:
+                    self._cond.wait()
+                    continue
+                wait = max(self.requests.wait_time(1), self.token_budget.wait_time(tokens))
+                if wait > 0:
+                    # Sleep without the lock so higher-priority arrivals can queue ahead
+                    self._cond.release()
+                    try:
+                        self._sleep(wait)
+                    finally:
+                        self._cond.acquire()
+                    continue
+                heapq.heappop(self._queue)
+                self.requests.consume(1)
+                self.token_budget.consume(tokens)
+                waited = self._clock() - enqueued
+                self.dispatched += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+                self._cond.notify_all()
+                return
+
+    def stats(self):
+        """Queue depth, wait times and retry counters"""
+        with self._cond:
+            return {
+                'queue_depth': len(self._queue),
+                'max_queue_depth': self.max_queue_depth,
+                'dispatched': self.dispatched,
+                'retries': self.retries,
+                'failures': self.failures,
+                'avg_wait': self.total_wait / self.dispatched if self.dispatched else 0.0,
+                'max_wait': self.max_wait,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler, sized from the environment on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(
+                rpm=int(os.getenv('STUDYMATE_RPM', '60')),
+                tpm=int(os.getenv('STUDYMATE_TPM', '1000000')),
+                max_retries=int(os.getenv('STUDYMATE_MAX_RETRIES', '4')),
+            )
+        return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Swap in another scheduler (e.g. with other budgets for benchmarks)"""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+
+
+def _collect():
+    return _scheduler.stats() if _scheduler is not None else {}
+
+
+get_telemetry().register('scheduler', _collect)
@@ -0,0 +1,160 @@
+import contextlib
+import hashlib
+import os
+import threading
+import time
+
+from app.utils.telemetry import get_telemetry
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to coalescing within this process only
+    fcntl = None
+
+DEFAULT_LOCK_DIR = os.path.join('.studymate_cache', 'locks')
+# Longest a caller waits for another one's generation before generating itself
+DEFAULT_TIMEOUT = 180
+
+# First and longest pause between attempts at another process's lock
+POLL_SECONDS = (0.01, 0.25)
+
+
+class SingleFlight:
+    """Keyed locks that let concurrent identical generations share one request.
+
+    The first caller for a key holds the lock while it generates; everyone
+    else blocks until it finishes and then re-checks the shared cache, which
+    by then holds the leader's result. Threads are coalesced with an
+    in-process lock and worker processes with an ``flock`` on a per-key file,
+    which the leader removes when it is done.
+
+    A caller waits at most ``timeout`` seconds (None waits indefinitely), so
+    a hung leader can't block everyone behind it; after that it goes ahead
+    and generates on its own.
+    """
+
+    def __init__(self, lock_dir=DEFAULT_LOCK_DIR, timeout=DEFAULT_TIMEOUT):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self.leaders = 0
+        self.coalesced = 0
+        self.cross_process_waits = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    @contextlib.contextmanager
+    def hold(self, key):
+        """Hold the flight for ``key``; yields True if we had to wait for another caller.
+
+        After a timeout this yields True without holding the flight.
+        """
+        with self._lock:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        lock = entry[0]
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        waited = not lock.acquire(blocking=False)
+        held = True
+        if waited:
+            self._count('coalesced')
+            held = lock.acquire(timeout=-1 if deadline is None else max(0, deadline - time.monotonic()))
+        try:
+            if not held:
+                self._count('timeouts')
+                yield True
+                return
+            with self._file_lock(key, deadline) as file_waited:
+                if file_waited and not waited:
+                    self._count('cross_process_waits')
+                if not (waited or file_waited):
+                    self._count('leaders')
+                yield waited or file_waited
+        finally:
+            if held:
+                lock.release()
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    @contextlib.contextmanager
+    def _file_lock(self, key, deadline):
+        if fcntl is None or not self.lock_dir:
+            yield False
+            return
+        os.makedirs(self.lock_dir, exist_ok=True)
+        path = os.path.join(self.lock_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock')
+        waited = False
+        delay = POLL_SECONDS[0]
+        while True:
+            handle = open(path, 'a')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._count('timeouts')
+                    yield True
+                    return
+                time.sleep(delay if remaining is None else min(delay, remaining))
+                delay = min(delay * 2, POLL_SECONDS[1])
+                continue
+            # The file may have been removed by its last holder after we opened it
+            try:
+                current = os.fstat(handle.fileno()).st_ino == os.stat(path).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                break
+            handle.close()
+        try:
+            yield waited
+        finally:
+            # Removed while still locked, so nobody can be left holding a lock on a stale file
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            handle.close()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        """How many generations led, and how many callers were coalesced onto them"""
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'cross_process_waits': self.cross_process_waits,
+                'timeouts': self.timeouts,
+                'in_flight': len(self._locks),
+            }
+
+
+_flights = None
+_flights_lock = threading.Lock()
+
+
+def get_flights():
+    """Return the process-wide SingleFlight instance"""
+    global _flights
+    with _flights_lock:
+        if _flights is None:
+            timeout = float(os.getenv('STUDYMATE_FLIGHT_TIMEOUT', DEFAULT_TIMEOUT))
+            _flights = SingleFlight(os.getenv('STUDYMATE_LOCK_DIR', DEFAULT_LOCK_DIR), timeout if timeout > 0 else None)
+        return _flights
+
+
+def _collect():
+    return _flights.stats() if _flights is not None else {}
+
+
+get_telemetry().register('flights', _collect)
@@ -0,0 +1,417 @@
+import json
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from app.services.cache import normalize_key
+from app.utils.telemetry import get_telemetry
+
+# Defaults can be overridden through the environment (see .env example)
+DEFAULT_INDEX_PATH = os.path.join('.studymate_cache', 'topics.jsonl')
+DEFAULT_THRESHOLD = 0.7
+
+NGRAM = 3
+
+# Shortest word a single typo is forgiven in
+TYPO_MIN_LENGTH = 7
+
+# Log lines replayed before the built index is snapshotted for faster loading
+SNAPSHOT_EVERY = 1000
+
+# Words that don't change what a topic is about
+STOPWORDS = frozenset(
+    'a an and basics for in intro introduction of on overview the to with'.split()
+)
+
+# Trailing + and # keep C, C++ and C# apart
+_WORDS = re.compile(r'\w+[+#]*')
+# Numbers, roman numerals and ordinals tell otherwise similar topics apart (World War I / II)
+_MARKER = re.compile(r'\d+(?:st|nd|rd|th)?|[ivx]{1,4}|first|second|third|fourth|fifth')
+_YEAR = re.compile(r'1\d{3}|20\d{2}')
+_PARENTHETICAL = re.compile(r'\(([^)]*)\)')
+
+
+class TopicMatch(namedtuple('TopicMatch', 'subject topic score')):
+    """An indexed topic whose materials can stand in for the one asked for"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['subject'], data['topic'], float(data['score']))
+
+    def to_dict(self):
+        return self._asdict()
+
+
+# TopicIndex attributes kept in the snapshot, and the version of their layout (bumped
+# too when matching rules change what they hold, so snapshots are rebuilt from the log)
+_STATE = ('_offset', '_topics', '_known', '_subjects', '_subject_count', '_exact', '_aliases',
+          '_vocab', '_df', '_indptr', '_indices', '_counts', '_subject_ids', '_words', '_qualifiers')
+SNAPSHOT_VERSION = 3
+
+
+def _tokens(key):
+    """Significant words of a normalized subject or topic, lightly singularized"""
+    words = _WORDS.findall(key.replace("'", ''))
+    tokens = []
+    for word in words:
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens or words
+
+
+def _split_qualifiers(key, tokens):
+    """``(core tokens, qualifiers)`` of a topic.
+
+    Qualifiers only narrow a topic down: years, and words in parentheses
+    other than numbering, so "The French Revolution (1789)" can stand in
+    for "French Revolution" but "Calculus (II)" can't for "Calculus".
+    """
+    inner = set(_tokens(' '.join(_PARENTHETICAL.findall(key))))
+    qualifiers = frozenset(token for token in tokens
+                           if _YEAR.fullmatch(token) or (token in inner and not _MARKER.fullmatch(token)))
+    core = [token for token in tokens if token not in qualifiers]
+    return (core, qualifiers) if core else (tokens, frozenset())
+
+
+def _typo(a, b):
+    """Whether two different words are one typo apart (an edit, or swapped neighbours).
+
+    Only words of TYPO_MIN_LENGTH letters or more count: one letter is all
+    that tells many shorter terms apart (Photon and Proton, Alkane and Alkene).
+    """
+    if (min(len(a), len(b)) < TYPO_MIN_LENGTH or abs(len(a) - len(b)) > 1
+            or _MARKER.fullmatch(a) or _MARKER.fullmatch(b)):
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:])
+    longer, shorter = (a, b) if len(a) > len(b) else (b, a)
+    return longer[i + 1:] == shorter[i:]
+
+
+def _same_words(a, b, qualifiers_a=frozenset(), qualifiers_b=frozenset()):
+    """Whether every word of each topic has a counterpart, exact or one typo off, in the other.
+
+    Qualifiers of one topic may go without a counterpart, as long as the
+    other topic has no unmatched words of its own.
+    """
+    unmatched_a = [x for x in a if not any(x == y or _typo(x, y) for y in b)]
+    unmatched_b = [y for y in b if not any(x == y or _typo(x, y) for x in a)]
+    if unmatched_a and unmatched_b:
+        return False
+    return qualifiers_a.issuperset(unmatched_a) and qualifiers_b.issuperset(unmatched_b)
+
+
+def _acronym(tokens):
+    return ''.join(token[0] for token in tokens) if len(tokens) > 1 else None
+
+
+def _grams(tokens):
+    """Character n-gram counts of each word, padded so word edges count"""
+    grams = Counter()
+    for token in tokens:
+        padded = f' {token} '
+        grams.update([padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1))])
+    return grams
+
+
+class NullTopicIndex:
+    """Index that never matches (used when topic matching is disabled)"""
+
+    def add(self, subject, topic):
+        pass
+
+    def find(self, subject, topic):
+        return None
+
+    def stats(self):
+        return {'topics': 0, 'ngrams': 0, 'lookups': 0, 'matches': 0}
+
+
+class TopicIndex:
+    """Finds previously generated topics close enough to reuse their materials.
+
+    Topics are TF-IDF weighted character trigram vectors held as one sparse
+    (CSR) matrix, scored against a query with a few NumPy passes, so a
+    lookup stays in the low milliseconds with tens of thousands of topics.
+    A candidate above the threshold must also have the same words up to
+    order, plurals, single typos in long words and a year or parenthetical
+    note on one side. Acronyms match their expansion (OOP and Object
+    Oriented Programming), and only topics of the same subject are
+    considered.
+
+    The index is an append-only JSONL log of the topics added, plus a
+    pickled snapshot of the built index so startup only replays the lines
+    added after it. Lookups pick up lines other workers appended since.
+    """
+
+    def __init__(self, path=None, threshold=DEFAULT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.lookups = 0
+        self.matches = 0
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._topics = []           # (subject, topic) as first added
+        self._known = set()         # normalized (subject, topic) pairs
+        self._subjects = {}         # subject or its acronym -> subject id
+        self._subject_count = 0
+        self._exact = {}            # (subject id, sorted tokens) -> topic id
+        self._aliases = {}          # (subject id, acronym) -> topic id, None when ambiguous
+        self._vocab = {}            # n-gram -> column
+        self._df = []               # topics containing each n-gram
+        self._indptr = [0]          # CSR rows: n-gram columns and counts per topic
+        self._indices = []
+        self._counts = []
+        self._subject_ids = []
+        self._words = []            # significant words per topic
+        self._qualifiers = []       # words of each topic that only narrow it down
+        self._matrix = None         # cached (indptr, indices, weights, norms, subject ids, idf)
+        self._unsaved = 0
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._load_snapshot()
+            self._refresh()
+
+    def _load_snapshot(self):
+        try:
+            with open(self.path + '.snapshot', 'rb') as handle:
+                state = pickle.load(handle)
+            # A snapshot past the end of the log belongs to a log that was since replaced
+            if state.get('version') != SNAPSHOT_VERSION or state['_offset'] > os.path.getsize(self.path):
+                return
+        except (OSError, EOFError, KeyError, ValueError, AttributeError, pickle.UnpicklingError):
+            return
+        for name in _STATE:
+            setattr(self, name, state[name])
+
+    def _save_snapshot(self):
+        temp = f'{self.path}.snapshot.{os.getpid()}.tmp'
+        try:
+            with open(temp, 'wb') as handle:
+                state = {name: getattr(self, name) for name in _STATE}
+                pickle.dump({'version': SNAPSHOT_VERSION, **state}, handle, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, self.path + '.snapshot')
+        except OSError:
+            return
+        self._unsaved = 0
+
+    def _refresh(self):
+        """Load lines appended to the log since it was last read"""
+        try:
+            if os.path.getsize(self.path) <= self._offset:
+                return
+            with open(self.path, 'rb') as handle:
+                handle.seek(self._offset)
+                data = handle.read()
+        except FileNotFoundError:
+            return
+        # A writer may be midway through its last line
+        end = data.rfind(b'\n') + 1
+        self._offset += end
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                self._insert(entry['subject'], entry['topic'])
+            except (ValueError, KeyError, TypeError):
+                continue
+        if self._unsaved >= SNAPSHOT_EVERY:
+            self._save_snapshot()
+
+    def _subject_id(self, subject, create=False):
+        """Id of a normalized subject; an acronym also finds its expansion (CS for Computer Science).
+
+        Only a one-word subject is looked up as an acronym: a full name
+        never borrows another's (Cognitive Science is not Computer Science).
+        """
+        sid = self._subjects.get(subject)
+        if sid is not None:
+            return sid
+        tokens = _tokens(subject)
+        key = ' '.join(tokens)
+        acronym = _acronym(tokens)
+        sid = self._subjects.get(key)
+        if sid is None and create:
+            sid = self._subject_count
+            self._subject_count += 1
+            self._subjects[key] = sid
+            if acronym:
+                self._subjects.setdefault(acronym, sid)
+        if sid is not None and create:
+            self._subjects[subject] = sid
+        return sid
+
+    def _insert(self, subject, topic):
+        pair = (normalize_key(subject), normalize_key(topic))
+        if pair in self._known:
+            return False
+        self._known.add(pair)
+        tokens = _tokens(pair[1])
+        core, qualifiers = _split_qualifiers(pair[1], tokens)
+        index = len(self._topics)
+        sid = self._subject_id(pair[0], create=True)
+        self._topics.append((subject, topic))
+        self._subject_ids.append(sid)
+        self._words.append(tuple(tokens))
+        self._qualifiers.append(qualifiers)
+        self._exact.setdefault((sid, ' '.join(sorted(tokens))), index)
+        acronym = _acronym(core)
+        if acronym:
+            key = (sid, acronym)
+            self._aliases[key] = index if key not in self._aliases else None
+
+        # Qualifiers don't count towards similarity; the word check decides on them
+        grams = _grams(core)
+        for gram in grams:
+            column = self._vocab.get(gram)
+            if column is None:
+                column = self._vocab[gram] = len(self._df)
+                self._df.append(0)
+            self._df[column] += 1
+            self._indices.append(column)
+        self._counts.extend(grams.values())
+        self._indptr.append(len(self._indices))
+        self._matrix = None
+        self._unsaved += 1
+        return True
+
+    def add(self, subject, topic):
+        """Index a generated topic (no-op if it is already indexed)"""
+        with self._lock:
+            if self.path:
+                self._refresh()
+            if not self._insert(subject, topic):
+                return
+            if self.path:
+                line = json.dumps({'subject': subject, 'topic': topic}, ensure_ascii=False) + '\n'
+                # One append per line, so concurrent workers don't interleave entries
+                with open(self.path, 'a', encoding='utf-8') as handle:
+                    handle.write(line)
+                # The offset stays put: the next refresh reads this line back and skips it as
+                # known, along with any lines other workers appended just before it
+                if self._unsaved >= SNAPSHOT_EVERY:
+                    self._save_snapshot()
+
+    def _build(self):
+        if self._matrix is None:
+            indptr = np.array(self._indptr, dtype=np.int64)
+            indices = np.array(self._indices, dtype=np.int32)
+            counts = np.array(self._counts, dtype=np.float32)
+            idf = np.log((1 + len(self._topics)) / (1 + np.array(self._df, dtype=np.float32))) + 1
+            weights = counts * idf[indices]
+            norms = np.sqrt(np.add.reduceat(weights * weights, indptr[:-1]))
+            self._matrix = (indptr, indices, weights, norms,
+                            np.array(self._subject_ids, dtype=np.int32), idf.astype(np.float32))
+        return self._matrix
+
+    def _match(self, sid, key):
+        """Best (topic id, score) for a normalized topic within a subject, or None"""
+        tokens = _tokens(key)
+        exact = self._exact.get((sid, ' '.join(sorted(tokens))))
+        if exact is not None:
+            return exact, 1.0
+        core, qualifiers = _split_qualifiers(key, tokens)
+        # Acronym typed for an indexed expansion, or an expansion of an indexed acronym
+        alias = self._aliases.get((sid, core[0])) if len(core) == 1 else None
+        if alias is None and _acronym(core):
+            alias = self._exact.get((sid, _acronym(core)))
+        if alias is not None:
+            return alias, 1.0
+
+        indptr, indices, weights, norms, subject_ids, idf = self._build()
+        grams = _grams(core)
+        query = np.zeros(len(idf), dtype=np.float32)
+        unseen = 0.0
+        # N-grams no topic has are weighted as if the query were indexed too
+        unseen_idf = math.log((1 + len(self._topics)) / 2) + 1
+        for gram, count in grams.items():
+            column = self._vocab.get(gram)
+            if column is None:
+                unseen += (count * unseen_idf) ** 2
+            else:
+                query[column] = count * idf[column]
+        norm = math.sqrt(float(query @ query) + unseen)
+        if not norm:
+            return None
+        scores = np.add.reduceat(weights * query[indices], indptr[:-1]) / (norms * norm)
+        scores[subject_ids != sid] = 0
+        # Similar spelling finds candidates; the words decide (Organic / Inorganic Chemistry)
+        candidates = np.flatnonzero(scores >= self.threshold)
+        for index in candidates[np.argsort(-scores[candidates])]:
+            if _same_words(tokens, self._words[index], qualifiers, self._qualifiers[index]):
+                return int(index), float(scores[index])
+        return None
+
+    def find(self, subject, topic):
+        """The closest indexed topic of the same subject as a TopicMatch, or None below the threshold"""
+        with self._lock:
+            if self.path:
+                self._refresh()
+            self.lookups += 1
+            if not self._topics:
+                return None
+            sid = self._subject_id(normalize_key(subject))
+            if sid is None:
+                return None
+            found = self._match(sid, normalize_key(topic))
+            if found is None:
+                return None
+            self.matches += 1
+            index, score = found
+            return TopicMatch(*self._topics[index], round(score, 3))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'topics': len(self._topics),
+                'ngrams': len(self._vocab),
+                'lookups': self.lookups,
+                'matches': self.matches,
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_topic_index():
+    """Return the process-wide topic index, loaded from the environment on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            path = os.getenv('STUDYMATE_TOPIC_INDEX', DEFAULT_INDEX_PATH)
+            threshold = float(os.getenv('STUDYMATE_TOPIC_MATCH', DEFAULT_THRESHOLD))
+            if path.lower() in ('', 'off', 'none') or not threshold:
+                _index = NullTopicIndex()
+            else:
+                _index = TopicIndex(path, threshold)
+        return _index
+
+
+def set_topic_index(index):
+    """Swap in another index (or a NullTopicIndex to turn matching off)"""
+    global _index
+    with _index_lock:
+        _index = index
+
+
+def _collect():
+    return _index.stats() if _index is not None else {}
+
+
+get_telemetry().register('topic_index', _collect)
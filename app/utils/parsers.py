@@ -1,32 +1,263 @@
+import dataclasses
 import json
+import logging
 import re
-import streamlit as st
+from collections import namedtuple
+from app.models import ITEM_TYPES, StudyMaterials
+from app.utils.telemetry import get_telemetry
 
-def parse_response(response_text):
-    """Parse the Gemini response and extract structured data"""
+try:
+    import orjson
+except ImportError:  # optional faster JSON backend
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ('summary', 'flashcards', 'mcqs', 'hard_terms', 'example_problems')
+
+# Schema of list items: field -> type. Fields in SECTION_FIELDS are required,
+# the rest default to an empty value when the model leaves them out.
+SECTION_SCHEMA = {
+    'flashcards': {'question': str, 'answer': str},
+    'mcqs': {'question': str, 'options': list, 'correct_answer': str, 'explanation': str},
+    'hard_terms': {'term': str, 'explanation': str},
+    'example_problems': {'problem': str, 'solution': str, 'explanation': str},
+}
+
+# Fields every item of a list section must carry to be usable in the UI
+SECTION_FIELDS = {
+    'flashcards': ('question', 'answer'),
+    'mcqs': ('question', 'options', 'correct_answer'),
+    'hard_terms': ('term', 'explanation'),
+    'example_problems': ('problem', 'solution'),
+}
+
+_FIELD_CHECKS = {
+    section: tuple((field, kind, field in SECTION_FIELDS[section]) for field, kind in schema.items())
+    for section, schema in SECTION_SCHEMA.items()
+}
+
+PARSE_ERROR_SUMMARY = "Unable to parse response. The AI might have returned content in the wrong format. Please try again."
+
+# materials is a StudyMaterials; missing lists the sections with nothing usable,
+# and partial is True when items had to be salvaged from broken JSON
+ParseResult = namedtuple('ParseResult', ['materials', 'missing', 'partial'])
+
+_decoder = json.JSONDecoder()
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
+def decode_payload(response_text):
+    """Decode the JSON object in a response, skipping code fences or chatter around it.
+
+    Returns None if there is no complete, valid object.
+    """
+    start = response_text.find('{')
+    if start < 0:
+        return None
+    if orjson is not None:
+        end = response_text.rfind('}')
+        try:
+            return orjson.loads(response_text[start:end + 1])
+        except orjson.JSONDecodeError:
+            pass
     try:
-        # Clean the response text
-        cleaned_text = response_text.strip()
-        
-        # Remove markdown code blocks if present
-        cleaned_text = re.sub(r'```json\s*', '', cleaned_text)
-        cleaned_text = re.sub(r'```\s*', '', cleaned_text)
-        
-        # Parse JSON
-        data = json.loads(cleaned_text)
-        return data
-    except json.JSONDecodeError as e:
-        st.error(f"Error parsing response: {str(e)}")
-        if len(response_text) > 500:
-             st.error(f"Raw response start: {response_text[:500]}...")
+        return _decoder.raw_decode(response_text, start)[0]
+    except json.JSONDecodeError:
+        return None
+
+
+def validate_item(section, item):
+    """Return a clean copy of a list item matching the schema, or None if it's unusable"""
+    if not isinstance(item, dict):
+        return None
+    # Fast path: well-formed items are used as they are
+    for field, kind, required in _FIELD_CHECKS[section]:
+        value = item.get(field)
+        if type(value) is not kind or (required and not value):
+            break
+    else:
+        return item
+    clean = {}
+    for field, kind in SECTION_SCHEMA[section].items():
+        value = item.get(field)
+        if kind is list:
+            value = [str(option) for option in value] if isinstance(value, list) else []
+        elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            value = str(value).strip()
         else:
-             st.error(f"Raw response: {response_text}")
-        
+            value = ''
+        clean[field] = value
+    if not all(clean[field] for field in SECTION_FIELDS[section]):
+        return None
+    return clean
+
+
+def validate_section(section, value):
+    """Validated value of a section, or None if nothing in it is usable"""
+    if section == 'summary':
+        return value.strip() if isinstance(value, str) and value.strip() else None
+    if not isinstance(value, list):
+        return None
+    items = [clean for clean in (validate_item(section, item) for item in value) if clean]
+    return items or None
+
+
+def parse_materials(response_text):
+    """Parse a full study-material response, recovering what it can from broken output"""
+    telemetry = get_telemetry()
+    with telemetry.span('parse'):
+        data = decode_payload(response_text)
+        partial = not isinstance(data, dict)
+        if partial:
+            # Truncated or malformed: salvage every item that closed cleanly
+            telemetry.incr('parse_recoveries')
+            parser = IncrementalParser()
+            parser.feed(response_text)
+            data = parser.materials
+
+    with telemetry.span('validate'):
+        values = {}
+        missing = []
+        for section in SECTIONS:
+            values[section] = validate_section(section, data.get(section))
+            if values[section] is None:
+                missing.append(section)
+        materials = StudyMaterials(values['summary'] or '', *[
+            tuple([ITEM_TYPES[section].from_clean(item) for item in values[section] or ()])
+            for section in SECTIONS[1:]
+        ])
+    if missing:
+        telemetry.incr('missing_sections', len(missing))
+    return ParseResult(materials, tuple(missing), partial)
+
+
+def parse_section(response_text, section):
+    """Parse a single-section response, dropping malformed items.
+
+    Returns None when nothing usable was found so the caller can retry.
+    """
+    data = decode_payload(response_text)
+    if not isinstance(data, dict):
+        data = IncrementalParser()
+        data.feed(response_text)
+        data = data.materials
+    return validate_section(section, data.get(section))
+
+
+def report_parse_error(response_text):
+    if len(response_text) > 500:
+        response_text = response_text[:500] + '...'
+    logger.error("Error parsing response: the AI returned content in the wrong format. Raw response: %s",
+                 response_text)
+
+
+def parse_response(response_text):
+    """Parse the Gemini response into StudyMaterials"""
+    result = parse_materials(response_text)
+    if len(result.missing) == len(SECTIONS):
+        report_parse_error(response_text)
         # Fallback: return empty structure
-        return {
-            "summary": "Unable to parse response. The AI might have returned content in the wrong format. Please try again.",
-            "flashcards": [],
-            "mcqs": [],
-            "hard_terms": [],
-            "example_problems": []
-        }
+        return dataclasses.replace(result.materials, summary=PARSE_ERROR_SUMMARY)
+    return result.materials
+
+
+class IncrementalParser:
+    """Incremental parser for the streamed study-material JSON.
+
+    Text is fed in arbitrary chunks; every time a top-level value (the
+    summary) or an item inside one of the top-level lists closes, it is
+    returned as a ``(section, item)`` event so the UI can render it straight
+    away instead of waiting for the whole response.
+    """
+
+    def __init__(self):
+        self.materials = {}
+        self.done = False
+        self._text = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._item_start = None
+        self._expect_key = False
+        self._section = None
+
+    def feed(self, chunk):
+        """Consume a chunk of text and return the events it completed"""
+        self._text += chunk
+        events = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            char = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._close_string(text, i, events)
+                continue
+
+            if self._depth == 0:
+                # Skip markdown fences or chatter before the JSON object
+                if char == '{':
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                self._depth += 1
+                if self._depth == 2:
+                    self.materials.setdefault(self._section, [])
+                elif self._depth == 3 and self._item_start is None:
+                    self._item_start = i
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 2 and self._item_start is not None:
+                    self._emit(self._section, text[self._item_start:i + 1], events)
+                    self._item_start = None
+                elif self._depth == 0:
+                    self.done = True
+            elif self._depth == 1:
+                if char == ',':
+                    self._expect_key = True
+                elif char == ':':
+                    self._expect_key = False
+        self._pos = len(text)
+        return events
+
+    def _close_string(self, text, end, events):
+        raw = text[self._string_start:end + 1]
+        if self._depth == 1:
+            if self._expect_key:
+                self._section = json.loads(raw)
+            else:
+                # Scalar top-level value such as the summary
+                self._emit(self._section, raw, events, scalar=True)
+        elif self._depth == 2 and self._item_start is None:
+            self._emit(self._section, raw, events)
+
+    def _emit(self, section, raw, events, scalar=False):
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            # Models sometimes leave a trailing comma inside an item
+            try:
+                value = json.loads(_TRAILING_COMMA.sub(r'\1', raw))
+            except json.JSONDecodeError:
+                return
+        if scalar:
+            self.materials[section] = value
+        else:
+            self.materials.setdefault(section, []).append(value)
+        events.append((section, value))
+
@@ -0,0 +1,284 @@
+"""Lightweight spans, counters and metric export for the generation pipeline.
+
+Spans time a block of work into a per-name latency histogram; counters
+count events. Both are plain in-process aggregates guarded by one lock, so
+the cost per span is a couple of microseconds and telemetry can stay on in
+production. Modules with their own ``stats()`` register them as collectors
+and are included in every export.
+
+Exports, configured from the environment:
+
+- ``STUDYMATE_METRICS_PORT``: serve Prometheus text format on
+  ``http://127.0.0.1:<port>/metrics`` from a background thread
+  (``STUDYMATE_METRICS_HOST`` binds another address).
+- ``STUDYMATE_TRACE_FILE``: append every finished span as a JSON line
+  (with trace and parent ids), plus a metrics snapshot at exit.
+- ``STUDYMATE_TELEMETRY=0`` turns spans and counters into no-ops.
+"""
+import atexit
+import bisect
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# (trace id, span id) of the innermost open span in this context
+_current = contextvars.ContextVar('studymate_span', default=None)
+_ids = itertools.count(1)
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+class _Histogram:
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+
+class Span:
+    """Times a ``with`` block; created by ``Telemetry.span``"""
+
+    __slots__ = ('telemetry', 'name', 'labels', 'start', 'ids', 'token')
+
+    def __init__(self, telemetry, name, labels):
+        self.telemetry = telemetry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        parent = _current.get()
+        span_id = next(_ids)
+        trace_id = parent[0] if parent else span_id
+        self.ids = (trace_id, span_id, parent[1] if parent else None)
+        self.token = _current.set((trace_id, span_id))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        try:
+            _current.reset(self.token)
+        except ValueError:
+            # Exited from another context (e.g. a generator resumed elsewhere)
+            pass
+        error = exc_type.__name__ if exc_type is not None and not issubclass(exc_type, GeneratorExit) else None
+        self.telemetry.observe(self.name, elapsed, self.labels, error=error, ids=self.ids)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class Telemetry:
+    """Process-wide span histograms, counters and registered stats collectors"""
+
+    def __init__(self, enabled=True, trace_file=None):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = {}
+        self._trace = open(trace_file, 'a', encoding='utf-8') if trace_file else None
+        self._server = None
+
+    def span(self, name, **labels):
+        """Context manager timing a block into the ``name`` histogram"""
+        if not self.enabled:
+            return _null_span
+        return Span(self, name, labels)
+
+    def observe(self, name, seconds, labels=None, error=None, ids=None):
+        """Record a duration measured elsewhere (e.g. time to first token)"""
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+            histogram.count += 1
+            histogram.total += seconds
+            if error is not None:
+                error_key = ('errors', _labels_key({'span': name, 'error': error}))
+                self._counters[error_key] = self._counters.get(error_key, 0) + 1
+            if self._trace is not None:
+                record = {'ts': time.time(), 'span': name, 'seconds': round(seconds, 6)}
+                if ids is not None:
+                    record['trace'], record['id'], record['parent'] = ids
+                if labels:
+                    record.update(labels)
+                if error is not None:
+                    record['error'] = error
+                self._trace.write(json.dumps(record, default=str) + '\n')
+
+    def incr(self, name, value=1, **labels):
+        """Add ``value`` to the ``name`` counter"""
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def register(self, name, collect, label=None):
+        """Include ``collect()`` (a module's ``stats()``) in exports.
+
+        ``collect`` returns ``{metric: number}``, or ``{key: {metric: number}}``
+        with each key exported under the ``label`` label.
+        """
+        with self._lock:
+            self._collectors[name] = (collect, label)
+
+    def collect(self):
+        """Current values of every registered collector"""
+        with self._lock:
+            collectors = list(self._collectors.items())
+        values = {}
+        for name, (collect, label) in collectors:
+            try:
+                values[name] = collect()
+            except Exception as e:
+                values[name] = {'collect_errors': 1}
+                logger.warning("Telemetry collector %s failed: %s", name, e)
+        return values
+
+    def snapshot(self):
+        """JSON-ready view of spans, counters and collected stats"""
+        with self._lock:
+            spans = [
+                {'span': name, **dict(labels), 'count': h.count, 'seconds': round(h.total, 6),
+                 'avg': round(h.total / h.count, 6) if h.count else 0.0}
+                for (name, labels), h in self._histograms.items()
+            ]
+            counters = [{'counter': name, **dict(labels), 'value': value}
+                        for (name, labels), value in self._counters.items()]
+        return {'ts': time.time(), 'spans': spans, 'counters': counters, 'stats': self.collect()}
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items(), key=lambda item: repr(item[0]))
+            counters = sorted(self._counters.items(), key=lambda item: repr(item[0]))
+        if histograms:
+            lines.append('# TYPE studymate_span_seconds histogram')
+        for (name, labels), h in histograms:
+            base = (('span', name),) + labels
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float('inf'),), h.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'studymate_span_seconds_bucket{_format_labels(base + (("le", le),))} {cumulative}')
+            lines.append(f'studymate_span_seconds_sum{_format_labels(base)} {h.total}')
+            lines.append(f'studymate_span_seconds_count{_format_labels(base)} {h.count}')
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f'studymate_{name}_total'
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric}{_format_labels(labels)} {value}')
+        with self._lock:
+            labels_by_collector = {name: label for name, (_, label) in self._collectors.items()}
+        for collector, values in sorted(self.collect().items()):
+            label = labels_by_collector.get(collector)
+            rows = values.items() if label else [(None, values)]
+            for key, row in rows:
+                for metric, value in row.items():
+                    if isinstance(value, bool):
+                        value = int(value)
+                    if isinstance(value, (int, float)):
+                        pairs = ((label, key),) if label else ()
+                        lines.append(f'studymate_{collector}_{metric}{_format_labels(pairs)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_snapshot(self):
+        """Append a metrics snapshot to the trace file, if there is one"""
+        if self._trace is None:
+            return
+        snapshot = json.dumps({'metrics': self.snapshot()}, default=str)
+        with self._lock:
+            self._trace.write(snapshot + '\n')
+            self._trace.flush()
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve /metrics on a daemon thread; returns the server"""
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = telemetry.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True).start()
+        return self._server
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    """Return the process-wide telemetry, starting its exporters on first use"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry(
+                enabled=os.getenv('STUDYMATE_TELEMETRY', '1') != '0',
+                trace_file=os.getenv('STUDYMATE_TRACE_FILE') or None,
+            )
+            atexit.register(_telemetry.write_snapshot)
+            port = os.getenv('STUDYMATE_METRICS_PORT')
+            if port and _telemetry.enabled:
+                try:
+                    _telemetry.serve(int(port), os.getenv('STUDYMATE_METRICS_HOST', '127.0.0.1'))
+                except OSError as e:
+                    # Another worker process already serves this port
+                    logger.warning("Metrics server not started on port %s: %s", port, e)
+        return _telemetry
+
@@ -0,0 +1,53 @@
+"""Compare per-session memory of dict materials against StudyMaterials records.
+
+Each representation is measured two ways for N concurrent sessions viewing
+the same topic: every session holding its own unpickled copy (as
+``st.cache_data`` hands out), and every session sharing one instance (as
+the in-process map of cached materials does). Comparing dict and record
+under the same sharing isolates what the slotted records save; comparing
+copies against shared shows what sharing saves:
+
+    python -m benchmarks.bench_memory --sessions 1 10 100
+"""
+import argparse
+import pickle
+import tracemalloc
+
+from app.models import StudyMaterials
+from app.services.fake_gemini import fake_materials
+
+
+def traced(build):
+    """Memory (bytes) still allocated by ``build()`` while its result is alive"""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    result = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args(argv)
+
+    data = fake_materials('Physics', 'Mechanics')
+    record = StudyMaterials.from_dict(data)
+    # Unpickled so each copy owns its strings, as in a session's copy
+    payloads = {'dict': pickle.dumps(data), 'record': pickle.dumps(record)}
+    print(f"one copy: dict {traced(lambda: pickle.loads(payloads['dict'])) / 1024:.1f} KiB, "
+          f"StudyMaterials {traced(lambda: pickle.loads(payloads['record'])) / 1024:.1f} KiB")
+    print(f"{'sessions':>8} {'dict copies':>12} {'record copies':>14} {'dict shared':>12} {'record shared':>14}  (KiB)")
+    for count in args.sessions:
+        row = []
+        for payload in payloads.values():
+            row.append(traced(lambda: [pickle.loads(payload) for _ in range(count)]))
+        for name in payloads:
+            shared = pickle.loads(payloads[name])
+            row.append(traced(lambda: [shared for _ in range(count)]))
+        print(f"{count:>8} {row[0] / 1024:>12.1f} {row[1] / 1024:>14.1f} {row[2] / 1024:>12.1f} {row[3] / 1024:>14.1f}")
+
+if __name__ == '__main__':
+    main()
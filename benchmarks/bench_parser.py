@@ -0,0 +1,88 @@
+"""Compare response parsing speed and recovery against the original parser.
+
+Builds a corpus of well-formed responses (plain, fenced, with chatter) and
+deliberately broken ones (truncated, trailing commas, bad items), then
+reports parse time and the share of items each parser recovers:
+
+    python -m benchmarks.bench_parser --topics 20 --repeat 20
+"""
+import argparse
+import json
+import re
+import time
+
+from app.models import StudyMaterials
+from app.services.fake_gemini import fake_materials
+from app.utils import parsers
+from app.utils.parsers import SECTIONS, parse_materials
+
+
+def legacy_parse(response_text):
+    """The original parser: two regex passes, then all-or-nothing json.loads"""
+    try:
+        cleaned_text = response_text.strip()
+        cleaned_text = re.sub(r'```json\s*', '', cleaned_text)
+        cleaned_text = re.sub(r'```\s*', '', cleaned_text)
+        return json.loads(cleaned_text)
+    except json.JSONDecodeError:
+        return {section: [] for section in SECTIONS}
+
+
+def current_parse(response_text):
+    return parse_materials(response_text).materials
+
+
+def count_items(materials):
+    if isinstance(materials, StudyMaterials):
+        materials = materials.to_dict()
+    return sum(len(materials.get(section) or []) for section in SECTIONS if section != 'summary')
+
+
+def build_corpus(topics):
+    """List of (kind, response text, items in the intended response)"""
+    corpus = []
+    for i in range(topics):
+        materials = fake_materials('Physics', f'Topic {i}')
+        text = json.dumps(materials, indent=2)
+        total = count_items(materials)
+        corpus.append(('plain', text, total))
+        corpus.append(('fenced', f"```json\n{text}\n```", total))
+        corpus.append(('chatter', f"Here are your study materials:\n```json\n{text}\n```\nGood luck!", total))
+        for cut in (0.25, 0.5, 0.75, 0.95):
+            corpus.append((f'truncated {int(cut * 100)}%', text[:int(len(text) * cut)], total))
+        corpus.append(('trailing commas', re.sub(r'"\n(\s*)}', '",\n\\1}', text), total))
+        bad_item = text.replace('"answer": "Point 3', '"answr": "Point 3', 1)
+        corpus.append(('bad item', bad_item, total))
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--topics', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.topics)
+    backend = 'orjson' if parsers.orjson is not None else 'json'
+    print(f"{len(corpus)} responses, JSON backend: {backend}")
+    print(f"{'kind':>16} {'parser':>8} {'us/parse':>9} {'recovered':>10}")
+
+    kinds = sorted({kind for kind, _, _ in corpus}, key=lambda k: [c[0] for c in corpus].index(k))
+    totals = {}
+    for kind in kinds:
+        docs = [(text, total) for k, text, total in corpus if k == kind]
+        for name, parse in (('legacy', legacy_parse), ('current', current_parse)):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                results = [parse(text) for text, _ in docs]
+            elapsed = (time.perf_counter() - start) / (args.repeat * len(docs))
+            recovered = sum(count_items(result) for result in results) / sum(total for _, total in docs)
+            totals.setdefault(name, []).append(recovered)
+            print(f"{kind:>16} {name:>8} {elapsed * 1e6:>9.0f} {recovered:>10.0%}")
+
+    for name, rates in totals.items():
+        print(f"mean recovery ({name}): {sum(rates) / len(rates):.0%}")
+
+
+if __name__ == '__main__':
+    main()
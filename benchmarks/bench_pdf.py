@@ -0,0 +1,192 @@
+"""Compare the PDF engine against the original FPDF implementation.
+
+Renders synthetic study guides of increasing size with both engines and
+reports pages per second and peak traced memory:
+
+    python -m benchmarks.bench_pdf --sizes 1 4 16 --repeat 3
+"""
+import argparse
+import random
+import time
+import tracemalloc
+import warnings
+
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+from app.models import StudyMaterials
+from app.services.pdf_generator import StudyGuidePDF, generate_pdf
+
+WORDS = (
+    "energy force momentum equilibrium velocity acceleration théorème Δx "
+    "integral derivative vector matrix λ eigenvalue résumé function limit"
+).split()
+
+
+def make_materials(scale, seed=0):
+    """Study materials roughly ``scale`` times the size of a normal guide"""
+    rng = random.Random(seed)
+
+    def sentence(n):
+        return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize() + '.'
+
+    return {
+        'summary': '\n\n'.join(' '.join(sentence(15) for _ in range(6)) for _ in range(5 * scale)),
+        'flashcards': [{'question': sentence(12), 'answer': sentence(40)} for _ in range(15 * scale)],
+        'mcqs': [
+            {
+                'question': sentence(15),
+                'options': [f"{letter}) {sentence(6)}" for letter in 'ABCD'],
+                'correct_answer': 'A) ...',
+                'explanation': sentence(30),
+            }
+            for _ in range(12 * scale)
+        ],
+        'hard_terms': [{'term': sentence(2), 'explanation': sentence(35)} for _ in range(12 * scale)],
+    }
+
+
+class LegacyStudyGuidePDF(FPDF):
+    """The original renderer: core Arial font, try/latin-1 fallback per body"""
+
+    def multi_cell(self, w, h, text, *args, **kwargs):
+        # PyFPDF 1.7 always returned to the left margin after a multi_cell
+        kwargs.setdefault('new_x', XPos.LMARGIN)
+        kwargs.setdefault('new_y', YPos.NEXT)
+        return super().multi_cell(w, h, text, *args, **kwargs)
+
+    def header(self):
+        self.set_font('Arial', 'B', 15)
+        self.cell(0, 10, 'Study Mate - AI Study Guide', 0, 1, 'C')
+        self.ln(10)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+
+    def chapter_title(self, title):
+        self.set_font('Arial', 'B', 12)
+        self.set_fill_color(200, 220, 255)
+        self.cell(0, 6, title, 0, 1, 'L', 1)
+        self.ln(4)
+
+    def chapter_body(self, body):
+        self.set_font('Arial', '', 11)
+        try:
+            self.multi_cell(0, 5, body)
+        except Exception:
+            cleaned = body.encode('latin-1', 'replace').decode('latin-1')
+            self.multi_cell(0, 5, cleaned)
+        self.ln()
+
+
+def _legacy_text(text):
+    # The original only sanitized chapter bodies; other calls raise on non-latin-1
+    # text with current fpdf releases, so apply the same replacement here
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+
+def legacy_generate_pdf(subject, topic, materials):
+    pdf = LegacyStudyGuidePDF()
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, f"Subject: {subject}", 0, 1)
+    pdf.set_font('Arial', 'I', 14)
+    pdf.cell(0, 10, f"Topic: {topic}", 0, 1)
+    pdf.ln(10)
+    if materials.get('summary'):
+        pdf.chapter_title("Summary")
+        pdf.chapter_body(materials['summary'])
+    if materials.get('hard_terms'):
+        pdf.chapter_title("Key Terms")
+        for term in materials['hard_terms']:
+            pdf.set_font('Arial', 'B', 11)
+            pdf.cell(0, 5, _legacy_text(f"- {term.get('term', '')}"), 0, 1)
+            pdf.set_font('Arial', '', 11)
+            pdf.multi_cell(0, 5, _legacy_text(f"  {term.get('explanation', '')}"))
+            pdf.ln(2)
+        pdf.ln(5)
+    if materials.get('flashcards'):
+        pdf.chapter_title("Flashcards (Q&A)")
+        for i, card in enumerate(materials['flashcards'], 1):
+            pdf.set_font('Arial', 'B', 11)
+            pdf.multi_cell(0, 5, _legacy_text(f"Q{i}: {card.get('question', '')}"))
+            pdf.set_font('Arial', '', 11)
+            pdf.multi_cell(0, 5, _legacy_text(f"A: {card.get('answer', '')}"))
+            pdf.ln(3)
+    if materials.get('mcqs'):
+        pdf.chapter_title("Multiple Choice Questions")
+        for i, mcq in enumerate(materials['mcqs'], 1):
+            pdf.set_font('Arial', 'B', 11)
+            pdf.multi_cell(0, 5, _legacy_text(f"{i}. {mcq.get('question', '')}"))
+            pdf.set_font('Arial', '', 10)
+            for opt in mcq.get('options', []):
+                pdf.cell(0, 5, _legacy_text(f"   {opt}"), 0, 1)
+            pdf.ln(1)
+            pdf.set_font('Arial', 'I', 10)
+            pdf.multi_cell(0, 5, _legacy_text(f"   Answer: {mcq.get('correct_answer', '')}"))
+            pdf.ln(3)
+    output = pdf.output(dest='S')
+    if isinstance(output, str):  # PyFPDF 1.7 returns str
+        return output.encode('latin-1', 'replace'), pdf.page_no()
+    return bytes(output).decode('latin-1').encode('latin-1', 'replace'), pdf.page_no()
+
+
+def current_generate_pdf(subject, topic, materials):
+    pages = []
+
+    class Counting(StudyGuidePDF):
+        def footer(self):
+            super().footer()
+            pages.append(self.page_no())
+
+    # Render through the real generate_pdf, counting pages via the footer hook
+    import app.services.pdf_generator as pdf_generator
+    original = pdf_generator.StudyGuidePDF
+    pdf_generator.StudyGuidePDF = Counting
+    try:
+        pdf_bytes = generate_pdf(subject, topic, materials)
+    finally:
+        pdf_generator.StudyGuidePDF = original
+    return pdf_bytes, len(pages)
+
+
+def measure(render, materials, repeat):
+    render('Physics', 'Mechanics', materials)  # warm up fonts and imports
+    start = time.perf_counter()
+    pages = 0
+    for _ in range(repeat):
+        _, count = render('Physics', 'Mechanics', materials)
+        pages += count
+    elapsed = time.perf_counter() - start
+
+    # Memory is traced in a separate run since tracemalloc skews the timings
+    tracemalloc.start()
+    render('Physics', 'Mechanics', materials)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pages / repeat, pages / elapsed, peak / 1024 / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 4, 16], help="guide size multipliers")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    warnings.simplefilter('ignore')
+
+    print(f"{'size':>5} {'engine':>8} {'pages':>6} {'pages/s':>9} {'peak MB':>8}")
+    for size in args.sizes:
+        materials = make_materials(size)
+        engines = (
+            ('legacy', legacy_generate_pdf, materials),
+            ('current', current_generate_pdf, StudyMaterials.from_dict(materials)),
+        )
+        for name, render, data in engines:
+            pages, rate, peak = measure(render, data, args.repeat)
+            print(f"{size:>5} {name:>8} {pages:>6.0f} {rate:>9.1f} {peak:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""Compare input tokens and latency of the compact prompts against the original ones.
+
+Builds single and per-section prompts for a fixed topic set with both
+builders, answers them with the local fake model (which charges
+``--input-latency`` seconds per 1000 prompt tokens on top of ``--latency``)
+and reports input tokens, response size and wall time per request:
+
+    python -m benchmarks.bench_prompts --latency 0.2 --input-latency 0.15
+
+With ``--count-tokens MODEL`` the input tokens are also counted by the
+Gemini API (needs GEMINI_API_KEY) instead of only estimated.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from app.services.fake_gemini import FakeModel
+from app.services.prompts import build_prompt, generation_config
+from app.services.scheduler import estimate_tokens
+from app.utils.parsers import SECTIONS, parse_materials
+
+TOPICS = [
+    ('Physics', "Newton's Laws"),
+    ('History', 'Roman Empire'),
+    ('Programming', 'Functions'),
+    ('Biology', 'DNA Replication'),
+    ('Mathematics', 'Linear Algebra'),
+    ('Chemistry', 'Chemical Equilibrium'),
+    ('Economics', 'Supply and Demand'),
+    ('Computer Science', 'Dynamic Programming'),
+]
+
+# The original JSON shape and requirements for each per-section sub-prompt
+LEGACY_SECTION_SPECS = {
+    'summary': (
+        '"summary": "Detailed summary of the topic (4-6 paragraphs covering all important aspects)"',
+        'Cover all important aspects of the topic in 4-6 paragraphs',
+    ),
+    'flashcards': (
+        '"flashcards": [{"question": "question", "answer": "detailed answer"}]',
+        'Generate AT LEAST 15 flashcards that cover fundamental concepts',
+    ),
+    'mcqs': (
+        '"mcqs": [{"question": "question", "options": ["A) option1", "B) option2", "C) option3", "D) option4"], '
+        '"correct_answer": "A) option1", "explanation": "Detailed explanation of why this is correct and others are wrong"}]',
+        'Generate AT LEAST 12 MCQs covering different aspects of the topic, with detailed explanations',
+    ),
+    'hard_terms': (
+        '"hard_terms": [{"term": "term", "explanation": "comprehensive explanation with examples"}]',
+        'Generate AT LEAST 12 hard terms that include key terminology from the topic',
+    ),
+    'example_problems': (
+        '"example_problems": [{"problem": "detailed problem statement", "solution": "comprehensive step-by-step solution", '
+        '"explanation": "detailed explanation of why this approach works and key concepts"}]',
+        'Generate AT LEAST 3 practical and illustrative example problems',
+    ),
+}
+
+
+def legacy_build_prompt(subject, topic):
+    """The original prompt with every placeholder object spelled out"""
+    return f"""
+    Create comprehensive study materials for:
+    SUBJECT: {subject}
+    TOPIC: {topic}
+    
+    Return the response in EXACTLY this JSON format:
+    {{
+        "summary": "Detailed summary of the topic (4-6 paragraphs covering all important aspects)",
+        "flashcards": [
+            {{"question": "question1", "answer": "detailed answer1"}},
+            {{"question": "question2", "answer": "detailed answer2"}},
+            {{"question": "question3", "answer": "detailed answer3"}},
+            {{"question": "question4", "answer": "detailed answer4"}},
+            {{"question": "question5", "answer": "detailed answer5"}},
+            {{"question": "question6", "answer": "detailed answer6"}},
+            {{"question": "question7", "answer": "detailed answer7"}},
+            {{"question": "question8", "answer": "detailed answer8"}},
+            {{"question": "question9", "answer": "detailed answer9"}},
+            {{"question": "question10", "answer": "detailed answer10"}},
+            {{"question": "question11", "answer": "detailed answer11"}},
+            {{"question": "question12", "answer": "detailed answer12"}},
+            {{"question": "question13", "answer": "detailed answer13"}},
+            {{"question": "question14", "answer": "detailed answer14"}},
+            {{"question": "question15", "answer": "detailed answer15"}}
+        ],
+        "mcqs": [
+            {{
+                "question": "question1",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "A) option1",
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question2",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "B) option2", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question3",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "C) option3", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question4",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "D) option4", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question5",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "A) option1", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question6",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "B) option2", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question7",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "C) option3", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question8",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "D) option4", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question9",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "A) option1", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question10",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "B) option2", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question11",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "C) option3", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }},
+            {{
+                "question": "question12",
+                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+                "correct_answer": "D) option4", 
+                "explanation": "Detailed explanation of why this is correct and others are wrong"
+            }}
+        ],
+        "hard_terms": [
+            {{"term": "term1", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term2", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term3", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term4", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term5", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term6", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term7", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term8", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term9", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term10", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term11", "explanation": "comprehensive explanation with examples"}},
+            {{"term": "term12", "explanation": "comprehensive explanation with examples"}}
+        ],
+        "example_problems": [
+            {{
+                "problem": "detailed problem statement 1",
+                "solution": "comprehensive step-by-step solution",
+                "explanation": "detailed explanation of why this approach works and key concepts"
+            }},
+            {{
+                "problem": "detailed problem statement 2", 
+                "solution": "comprehensive step-by-step solution",
+                "explanation": "detailed explanation of why this approach works and key concepts"
+            }},
+            {{
+                "problem": "detailed problem statement 3",
+                "solution": "comprehensive step-by-step solution",
+                "explanation": "detailed explanation of why this approach works and key concepts"
+            }}
+        ]
+    }}
+    
+    IMPORTANT REQUIREMENTS:
+    - Generate AT LEAST 12 MCQs (multiple choice questions)
+    - Generate AT LEAST 15 flashcards
+    - Generate AT LEAST 12 hard terms with explanations
+    - Generate AT LEAST 3 example problems
+    - Make all content comprehensive, detailed, and educational
+    - Ensure MCQs cover different aspects of the topic
+    - Provide detailed explanations for MCQ answers
+    - Make flashcards cover fundamental concepts
+    - Ensure hard terms include key terminology from the topic
+    - Make example problems practical and illustrative
+    
+    Provide accurate and educational content suitable for students.
+    Make the content engaging and informative.
+    """
+
+
+def legacy_build_section_prompt(subject, topic, section):
+    """The original per-section prompt"""
+    shape, requirement = LEGACY_SECTION_SPECS[section]
+    return f"""
+    Create study materials for:
+    SUBJECT: {subject}
+    TOPIC: {topic}
+    
+    Return the response in EXACTLY this JSON format:
+    {{{shape}}}
+    
+    IMPORTANT REQUIREMENTS:
+    - {requirement}
+    - Make all content comprehensive, detailed, and educational
+    
+    Provide accurate and educational content suitable for students.
+    """
+
+
+def prompt_sets():
+    """(name, list of prompt-text lists per topic, generation kwargs) for each builder and mode"""
+    json_mode = {'generation_config': generation_config()} if generation_config() else {}
+    return [
+        ('legacy single', [[legacy_build_prompt(*pair)] for pair in TOPICS], {}),
+        ('compact single', [[build_prompt(*pair).text] for pair in TOPICS], json_mode),
+        ('legacy sectioned', [[legacy_build_section_prompt(*pair, s) for s in SECTIONS] for pair in TOPICS], {}),
+        ('compact sectioned', [[build_prompt(*pair, sections=(s,)).text for s in SECTIONS] for pair in TOPICS], json_mode),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.2, help="fake model time per response (s)")
+    parser.add_argument('--input-latency', type=float, default=0.15, help="fake model time per 1000 prompt tokens (s)")
+    parser.add_argument('--count-tokens', metavar='MODEL', help="also count tokens with this Gemini model")
+    args = parser.parse_args(argv)
+
+    counter = None
+    if args.count_tokens:
+        import google.generativeai as genai
+        genai.configure(api_key=os.environ['GEMINI_API_KEY'])
+        counter = genai.GenerativeModel(args.count_tokens)
+
+    model = FakeModel(latency=args.latency, input_latency=args.input_latency)
+    header = f"{'prompts':>18} {'in tok/topic':>13} {'out chars':>10} {'s/topic':>8} {'items':>6}"
+    if counter:
+        header += f" {'API tok':>8}"
+    print(f"{len(TOPICS)} topics")
+    print(header)
+    for name, per_topic, kwargs in prompt_sets():
+        tokens, chars, seconds, items, api_tokens = [], [], [], [], []
+        for prompts in per_topic:
+            tokens.append(sum(estimate_tokens(text) for text in prompts))
+            if counter:
+                api_tokens.append(sum(counter.count_tokens(text).total_tokens for text in prompts))
+            start = time.perf_counter()
+            texts = [model.generate_content(text, **kwargs).text for text in prompts]
+            seconds.append(time.perf_counter() - start)
+            chars.append(sum(len(text) for text in texts))
+            items.append(sum(
+                len(value) for text in texts
+                for section, value in parse_materials(text).materials.to_dict().items() if section != 'summary'
+            ))
+        line = (f"{name:>18} {statistics.mean(tokens):>13.0f} {statistics.mean(chars):>10.0f} "
+                f"{statistics.mean(seconds):>8.2f} {statistics.mean(items):>6.0f}")
+        if counter:
+            line += f" {statistics.mean(api_tokens):>8.0f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
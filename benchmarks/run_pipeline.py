@@ -0,0 +1,234 @@
+"""Load-test the full generation pipeline offline against the fake Gemini model.
+
+Every request generates study materials through the real pipeline
+(scheduler, single-flight, parsing, gap filling) against FakeModel, then
+renders the PDF. Reports p50/p95/p99 latency per stage, throughput and
+peak memory, and saves the results as JSON:
+
+    python -m benchmarks.run_pipeline --requests 200 --concurrency 16 \\
+        --latency 0.5 --error-rate 0.05 --output results.json
+
+Pass ``--baseline`` with an earlier results file to compare. The exit status
+is 1 when any stage got slower (or throughput dropped) by more than
+``--threshold``, so the command can gate a deploy.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Stages whose latency percentiles are compared against the baseline
+COMPARED = ('total', 'generate', 'pdf')
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of ``values`` (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-p * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+def summarize(values):
+    summary = {f'p{p}': round(percentile(values, p), 6) for p in PERCENTILES}
+    summary['mean'] = round(statistics.mean(values), 6) if values else 0.0
+    summary['count'] = len(values)
+    return summary
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def configure(args):
+    """Point the pipeline at seeded fake models with benchmark-sized budgets"""
+    os.environ['STUDYMATE_FAKE_GEMINI'] = '1'
+    os.environ['STUDYMATE_GENERATION_MODE'] = args.mode if args.mode != 'stream' else 'single'
+    os.environ.setdefault('STUDYMATE_LOCK_DIR', os.path.join(tempfile.mkdtemp(prefix='studymate-bench-'), 'locks'))
+
+    from app.services.cache import NullCache, SQLiteCache, set_cache
+    from app.services.client_pool import ModelPool, set_pool
+    from app.services.fake_gemini import FakeModel
+    from app.services.scheduler import RequestScheduler, set_scheduler
+    from app.services.topic_index import NullTopicIndex, TopicIndex, set_topic_index
+
+    seeds = random.Random(args.seed)
+    set_pool(ModelPool(None, factory=lambda name: FakeModel(
+        name,
+        latency=args.latency,
+        input_latency=args.input_latency,
+        error_rate=args.error_rate,
+        chunk_size=args.chunk_size,
+        seed=seeds.randrange(2 ** 32),
+    )))
+    set_scheduler(RequestScheduler(
+        rpm=args.rpm,
+        tpm=args.tpm,
+        base_delay=args.retry_delay,
+        max_delay=args.retry_delay * 8,
+        rng=random.Random(args.seed).random,
+    ))
+    if args.cache == 'disk':
+        directory = tempfile.mkdtemp(prefix='studymate-bench-')
+        set_cache(SQLiteCache(os.path.join(directory, 'materials.db')))
+        set_topic_index(TopicIndex(os.path.join(directory, 'topics.jsonl')))
+    else:
+        set_cache(NullCache())
+        set_topic_index(NullTopicIndex())
+
+
+def run(args):
+    configure(args)
+    from app.errors import StudyMateError
+    from app.services.gemini import build_study_material, stream_study_material
+    from app.services.pdf_generator import generate_pdf
+    from app.utils.telemetry import get_telemetry
+
+    def one(index):
+        subject = f"Subject {index % 7}"
+        topic = f"Topic {index % args.topics}"
+        timings = {}
+        start = time.perf_counter()
+        materials = None
+        try:
+            if args.mode == 'stream':
+                for section, item in stream_study_material(subject, topic):
+                    if section is None:
+                        materials = item
+            else:
+                materials = build_study_material(subject, topic)
+        except StudyMateError:
+            pass
+        generated = time.perf_counter()
+        timings['generate'] = generated - start
+        if materials is None:
+            return timings, False
+        if args.pdf:
+            generate_pdf(subject, topic, materials)
+            timings['pdf'] = time.perf_counter() - generated
+        timings['total'] = time.perf_counter() - start
+        return timings, True
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        outcomes = list(executor.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    stages = {}
+    for timings, ok in outcomes:
+        if ok:
+            for stage, seconds in timings.items():
+                stages.setdefault(stage, []).append(seconds)
+    succeeded = sum(ok for _, ok in outcomes)
+    snapshot = get_telemetry().snapshot()
+    return {
+        'config': {**vars(args), 'output': None, 'baseline': None},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'requests': args.requests,
+        'succeeded': succeeded,
+        'errors': args.requests - succeeded,
+        'seconds': round(elapsed, 3),
+        'throughput': round(succeeded / elapsed, 3) if elapsed else 0.0,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'peak_rss_growth_mb': round(peak_rss_mb() - rss_before, 1),
+        'stages': {stage: summarize(values) for stage, values in stages.items()},
+        # Averages of the pipeline's own spans (parse, validate, model_call, ...)
+        'spans': sorted(snapshot['spans'], key=lambda span: span['span']),
+        'counters': snapshot['counters'],
+        # Scheduler retries, pool fallbacks and the other collected stats()
+        'stats': snapshot['stats'],
+    }
+
+
+def compare(results, baseline, threshold):
+    """Lines describing changes against ``baseline`` and whether any is a regression"""
+    lines = []
+    regressed = False
+    for stage in COMPARED:
+        old = baseline.get('stages', {}).get(stage)
+        new = results['stages'].get(stage)
+        if not old or not new:
+            continue
+        for key in ('p50', 'p95', 'p99'):
+            if not old[key]:
+                continue
+            change = new[key] / old[key] - 1
+            flag = change > threshold
+            regressed |= flag
+            lines.append(f"{stage:>9} {key:>4} {old[key] * 1000:>10.1f} {new[key] * 1000:>10.1f} "
+                         f"{change:>+8.1%}{'  REGRESSION' if flag else ''}")
+    if baseline.get('throughput'):
+        change = results['throughput'] / baseline['throughput'] - 1
+        flag = change < -threshold
+        regressed |= flag
+        lines.append(f"{'throughput':>14} {baseline['throughput']:>10.2f} {results['throughput']:>10.2f} "
+                     f"{change:>+8.1%}{'  REGRESSION' if flag else ''}")
+    return lines, regressed
+
+
+def report(results):
+    print(f"{results['succeeded']}/{results['requests']} requests in {results['seconds']:.2f} s, "
+          f"{results['throughput']:.2f} req/s, peak RSS {results['peak_rss_mb']:.1f} MB")
+    print(f"{'stage':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    for stage, summary in results['stages'].items():
+        print(f"{stage:>9} {summary['p50'] * 1000:>9.1f} {summary['p95'] * 1000:>9.1f} "
+              f"{summary['p99'] * 1000:>9.1f} {summary['mean'] * 1000:>9.1f}")
+    print(f"{'span':<40} {'count':>6} {'avg ms':>9}")
+    for span in results['spans']:
+        labels = ','.join(f"{key}={value}" for key, value in span.items()
+                          if key not in ('span', 'count', 'seconds', 'avg'))
+        name = span['span'] + (f"[{labels}]" if labels else '')
+        print(f"{name:<40} {span['count']:>6} {span['avg'] * 1000:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--topics', type=int, default=None, help="distinct topics (default: one per request)")
+    parser.add_argument('--mode', choices=('single', 'sectioned', 'stream'), default='single')
+    parser.add_argument('--latency', type=float, default=0.2, help="fake model seconds per response")
+    parser.add_argument('--input-latency', type=float, default=0.0, help="fake model seconds per 1000 prompt tokens")
+    parser.add_argument('--chunk-size', type=int, default=200, help="characters per streamed chunk")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of calls failing with a quota error")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rpm', type=int, default=100_000)
+    parser.add_argument('--tpm', type=int, default=1_000_000_000)
+    parser.add_argument('--retry-delay', type=float, default=0.05, help="base delay between retries")
+    parser.add_argument('--cache', choices=('off', 'disk'), default='off', help="materials cache to use")
+    parser.add_argument('--no-pdf', dest='pdf', action='store_false', help="skip the PDF stage")
+    parser.add_argument('--output', help="write the results JSON here")
+    parser.add_argument('--baseline', help="earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown before failing (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+    args.topics = args.topics or args.requests
+
+    results = run(args)
+    report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            lines, regressed = compare(results, json.load(handle), args.threshold)
+        print(f"\nvs {args.baseline}")
+        print(f"{'stage':>9} {'':>4} {'base ms':>10} {'now ms':>10} {'change':>8}")
+        print('\n'.join(lines))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,8 +10,227 @@ os.environ['STREAMLIT_RUNNING_IN_BARE_MODE'] = 'true'
 # Load environment variables
 load_dotenv()
 
-from app.services.gemini import generate_study_material
-from app.services.pdf_generator import generate_pdf
+from app.errors import ConfigurationError, StudyMateError
+from app.services.exporters import EXPORTERS, export_document
+from app.services.pdf_generator import get_pdf, peek_pdf, prefetch_pdf
+from app.utils.telemetry import get_telemetry
+
+# With a generation service configured the UI is a thin client; otherwise it generates in process
+SERVICE_URL = os.getenv('STUDYMATE_SERVICE_URL')
+if SERVICE_URL:
+    from app.client import ServiceClient
+    client = ServiceClient(SERVICE_URL)
+    stream_study_material = client.stream_study_material
+    extend_materials = client.extend_materials
+else:
+    from app.services.gemini import extend_materials, stream_study_material
+
+# Items shown per page of a section
+PAGE_SIZE = max(1, int(os.getenv('STUDYMATE_PAGE_SIZE', '10')))
+
+# Items added by a section's "generate more" button
+MORE_ITEMS = 5
+
+SECTION_TABS = {
+    'flashcards': "📋 Flashcards",
+    'mcqs': "❓ MCQs",
+    'hard_terms': "🔤 Key Terms",
+    'example_problems': "📊 Examples",
+}
+SECTION_HEADINGS = {
+    'flashcards': ("Flashcards ({} cards)", "flashcards"),
+    'mcqs': ("Multiple Choice Questions ({} questions)", "MCQs"),
+    'hard_terms': ("Key Terms Explained ({} terms)", "key terms"),
+    'example_problems': ("Example Problems ({} examples)", "example problems"),
+}
+
+# Fragments (Streamlit 1.33+) rerun on their own; older versions rerun the whole page
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
+def render_flashcard(i, card):
+    with st.expander(f"📄 Card {i+1}: {card.question}", expanded=False):
+        st.success(f"**Answer:** {card.answer}")
+
+def render_mcq(i, mcq):
+    with st.container():
+        st.write(f"**{i+1}. {mcq.question}**")
+        
+        # Display options
+        for option in mcq.options:
+            st.write(f"   {option}")
+        
+        with st.expander("Show Answer & Detailed Explanation", expanded=False):
+            st.success(f"**Correct Answer:** {mcq.correct_answer}")
+            st.info(f"**Explanation:** {mcq.explanation}")
+        st.markdown("---")
+
+def render_term(term):
+    with st.container():
+        st.markdown(f"### 🔍 {term.term}")
+        st.write(term.explanation)
+        st.markdown("---")
+
+def render_example(i, example):
+    with st.expander(f"Example {i+1}: Problem Statement", expanded=False):
+        st.write(f"**Problem:** {example.problem}")
+        st.write(f"**Solution:**")
+        st.code(example.solution, language='text')
+        st.write(f"**Explanation:** {example.explanation}")
+
+def render_stream(events):
+    """Render items into the tabs as they stream in and return the final materials"""
+    st.header("📝 Comprehensive Summary")
+    summary_slot = st.empty()
+    summary_slot.info("🧠 Generating comprehensive study materials...")
+    
+    tab1, tab2, tab3, tab4 = st.tabs(list(SECTION_TABS.values()))
+    with tab1:
+        flashcard_cols = st.columns(2)
+    # Each section keeps its tab and the number of items shown so far
+    counts = {'flashcards': 0, 'mcqs': 0, 'hard_terms': 0, 'example_problems': 0}
+    
+    for section, item in events:
+        if section is None:
+            return item
+        if section == 'match':
+            # Materials of a close earlier topic are served from the cache
+            st.session_state.match = item
+            continue
+        if section == 'summary':
+            summary_slot.write(item)
+            continue
+        if section not in counts:
+            continue
+        i = counts[section]
+        counts[section] += 1
+        if section == 'flashcards':
+            with flashcard_cols[i % 2]:
+                render_flashcard(i, item)
+        elif section == 'mcqs':
+            with tab2:
+                render_mcq(i, item)
+        elif section == 'hard_terms':
+            with tab3:
+                render_term(item)
+        else:
+            with tab4:
+                render_example(i, item)
+    return None
+
+def render_materials(subject, topic, materials):
+    """Render the download button, summary and section view for finished materials"""
+    # Header with Download Button
+    col1, col2 = st.columns([0.8, 0.2])
+    with col1:
+        st.header("📝 Comprehensive Summary")
+    with col2:
+        # PDFs are rendered in the background after generation and memoized,
+        # so reruns don't re-render the whole document
+        pdf_bytes = peek_pdf(subject, topic, materials)
+        if pdf_bytes is None and st.button("📄 Prepare PDF"):
+            with st.spinner("Rendering PDF..."):
+                pdf_bytes = get_pdf(subject, topic, materials)
+        if pdf_bytes is not None:
+            st.download_button(
+                label="📥 Download PDF",
+                data=pdf_bytes,
+                file_name=EXPORTERS['pdf'].filename(subject, topic),
+                mime="application/pdf"
+            )
+        # Memoized per format and materials, so reruns don't rebuild the document
+        name = st.selectbox("Other formats", [name for name in EXPORTERS if name != 'pdf'],
+                            format_func=lambda name: EXPORTERS[name].label, key='export_format')
+        exporter = EXPORTERS[name]
+        st.download_button(
+            label=f"📥 Download {exporter.label}",
+            data=export_document(name, subject, topic, materials),
+            file_name=exporter.filename(subject, topic),
+            mime=exporter.mime
+        )
+
+    st.write(materials.summary or 'No summary available')
+    render_section(subject, topic, materials)
+
+def choose_section(materials):
+    """Section picker showing item counts; defaults to flashcards"""
+    options = list(SECTION_TABS)
+    label = lambda section: f"{SECTION_TABS[section]} ({len(getattr(materials, section))})"
+    if hasattr(st, 'segmented_control'):
+        section = st.segmented_control("Section", options, default=options[0], format_func=label,
+                                       key='section', label_visibility='collapsed')
+    else:
+        section = st.radio("Section", options, format_func=label, key='section', horizontal=True,
+                           label_visibility='collapsed')
+    return section or options[0]
+
+def turn_page(section, step):
+    # Button callback: runs before the rerun draws the page, so the controls match it
+    st.session_state.pages[section] = st.session_state.pages.get(section, 0) + step
+
+def paginate(section, items):
+    """Draw page controls for a section and return the offset and items of its current page"""
+    pages = -(-len(items) // PAGE_SIZE)
+    page = max(0, min(st.session_state.pages.get(section, 0), pages - 1))
+    st.session_state.pages[section] = page
+    if pages > 1:
+        prev_col, label_col, next_col = st.columns([0.2, 0.6, 0.2])
+        prev_col.button("◀ Previous", key=f'{section}_prev', disabled=page == 0,
+                        on_click=turn_page, args=(section, -1))
+        next_col.button("Next ▶", key=f'{section}_next', disabled=page == pages - 1,
+                        on_click=turn_page, args=(section, 1))
+        label_col.caption(f"Page {page + 1} of {pages}")
+    start = page * PAGE_SIZE
+    return start, items[start:start + PAGE_SIZE]
+
+def generate_more(subject, topic, section, noun):
+    """Button that adds MORE_ITEMS new items to a section, keeping the existing ones"""
+    if not st.button(f"➕ Generate {MORE_ITEMS} more {noun}", key=f'{section}_more'):
+        return
+    try:
+        with st.spinner(f"Generating more {noun}..."):
+            extended = extend_materials(subject, topic, section, MORE_ITEMS)
+    except StudyMateError as e:
+        st.error(str(e))
+        return
+    st.session_state.materials = extended
+    # Show the page with the new items
+    st.session_state.pages[section] = (len(getattr(extended, section)) - 1) // PAGE_SIZE
+    st.rerun()
+
+@fragment
+def render_section(subject, topic, materials):
+    """Render one page of the chosen section only.
+
+    Unlike tabs, which build every item of every section on each rerun,
+    this keeps reruns the same size however many items were generated;
+    switching section or page reruns just this fragment.
+    """
+    section = choose_section(materials)
+    items = getattr(materials, section)
+    heading, noun = SECTION_HEADINGS[section]
+    st.subheader(heading.format(len(items)))
+    if not items:
+        st.info(f"No {noun} generated. Try again with a different topic.")
+        generate_more(subject, topic, section, noun)
+        return
+    with get_telemetry().span('ui_render', view='section'):
+        start, page = paginate(section, items)
+        if section in ('flashcards', 'hard_terms'):
+            # Two-column grid
+            cols = st.columns(2)
+            for i, item in enumerate(page, start):
+                with cols[(i - start) % 2]:
+                    if section == 'flashcards':
+                        render_flashcard(i, item)
+                    else:
+                        render_term(item)
+        elif section == 'mcqs':
+            for i, mcq in enumerate(page, start):
+                render_mcq(i, mcq)
+        else:
+            for i, example in enumerate(page, start):
+                render_example(i, example)
+    generate_more(subject, topic, section, noun)
 
 def main():
     st.set_page_config(
@@ -27,6 +246,13 @@ def main():
     # Initialize session state
     if 'materials' not in st.session_state:
         st.session_state.materials = None
+    if 'match' not in st.session_state:
+        st.session_state.match = None
+    if 'generated_for' not in st.session_state:
+        # (subject, topic) the materials belong to; the sidebar inputs may have been edited since
+        st.session_state.generated_for = None
+    if 'pages' not in st.session_state:
+        st.session_state.pages = {}
     
     # Sidebar for inputs
     with st.sidebar:
@@ -34,13 +260,11 @@ def main():
         subject = st.text_input("Subject (e.g., Physics, History, Python):", placeholder="Mathematics")
         topic = st.text_input("Topic (e.g., Calculus, French Revolution, OOP):", placeholder="Linear Algebra")
         
-        if st.button("Generate Study Materials", type="primary", use_container_width=True):
-            if subject and topic:
-                with st.spinner("🧠 Generating comprehensive study materials... This may take a moment."):
-                    # Logic is now handled in the service with caching
-                    st.session_state.materials = generate_study_material(subject, topic)
-            else:
-                st.warning("Please enter both subject and topic")
+        fresh = st.checkbox("Force fresh generation",
+                            help="Generate new materials even if this topic, or a very similar one, was generated before")
+        generate = st.button("Generate Study Materials", type="primary", use_container_width=True)
+        if generate and not (subject and topic):
+            st.warning("Please enter both subject and topic")
         
         st.markdown("---")
         st.markdown("### 🔧 Made by:")
@@ -48,92 +272,39 @@ def main():
            Amanshu Sharma    
         """)
     
+    if generate and subject and topic:
+        # Show items as they stream in, then hand over to the regular view
+        live = st.empty()
+        error = None
+        st.session_state.match = None
+        st.session_state.pages = {}
+        try:
+            with live.container(), get_telemetry().span('ui_render', view='stream'):
+                st.session_state.materials = render_stream(stream_study_material(subject, topic, fresh=fresh))
+        except StudyMateError as e:
+            st.session_state.materials = None
+            error = e
+        live.empty()
+        if isinstance(error, ConfigurationError):
+            st.error(f"🔑 {error}")
+            st.info("Create a .env file in your project folder with:")
+            st.code("GEMINI_API_KEY=your_actual_api_key_here")
+        elif error is not None:
+            st.error(str(error))
+        if st.session_state.materials:
+            match = st.session_state.match
+            # A close match's materials belong to (and are cached under) its own topic
+            st.session_state.generated_for = (match.subject, match.topic) if match else (subject, topic)
+            prefetch_pdf(*st.session_state.generated_for, st.session_state.materials)
+    
     # Display materials if available
     if st.session_state.materials:
-        materials = st.session_state.materials
-        
-        # Header with Download Button
-        col1, col2 = st.columns([0.8, 0.2])
-        with col1:
-            st.header("📝 Comprehensive Summary")
-        with col2:
-            pdf_bytes = generate_pdf(subject, topic, materials)
-            st.download_button(
-                label="📥 Download PDF",
-                data=pdf_bytes,
-                file_name=f"{subject}_{topic}_StudyGuide.pdf",
-                mime="application/pdf"
-            )
-
-        st.write(materials.get('summary', 'No summary available'))
-        
-        # Create tabs for different study materials
-        tab1, tab2, tab3, tab4 = st.tabs(["📋 Flashcards", "❓ MCQs", "🔤 Key Terms", "📊 Examples"])
-        
-        # Flashcards Tab
-        with tab1:
-            st.subheader(f"Flashcards ({len(materials.get('flashcards', []))} cards)")
-            flashcards = materials.get('flashcards', [])
-            if flashcards:
-                # Display flashcards in a grid
-                cols = st.columns(2)
-                for i, card in enumerate(flashcards):
-                    with cols[i % 2]:
-                        with st.expander(f"📄 Card {i+1}: {card.get('question', '')}", expanded=False):
-                            st.success(f"**Answer:** {card.get('answer', '')}")
-            else:
-                st.info("No flashcards generated. Try again with a different topic.")
-        
-        # MCQs Tab
-        with tab2:
-            st.subheader(f"Multiple Choice Questions ({len(materials.get('mcqs', []))} questions)")
-            mcqs = materials.get('mcqs', [])
-            if mcqs:
-                for i, mcq in enumerate(mcqs):
-                    with st.container():
-                        st.write(f"**{i+1}. {mcq.get('question', '')}**")
-                        
-                        # Display options
-                        options = mcq.get('options', [])
-                        for option in options:
-                            st.write(f"   {option}")
-                        
-                        with st.expander("Show Answer & Detailed Explanation", expanded=False):
-                            st.success(f"**Correct Answer:** {mcq.get('correct_answer', '')}")
-                            st.info(f"**Explanation:** {mcq.get('explanation', '')}")
-                        st.markdown("---")
-            else:
-                st.info("No MCQs generated. Try again with a different topic.")
-        
-        # Hard Terms Tab
-        with tab3:
-            st.subheader(f"Key Terms Explained ({len(materials.get('hard_terms', []))} terms)")
-            terms = materials.get('hard_terms', [])
-            if terms:
-                # Display terms in a 2-column layout
-                cols = st.columns(2)
-                for i, term in enumerate(terms):
-                    with cols[i % 2]:
-                        with st.container():
-                            st.markdown(f"### 🔍 {term.get('term', '')}")
-                            st.write(term.get('explanation', ''))
-                            st.markdown("---")
-            else:
-                st.info("No key terms generated. Try again with a different topic.")
-        
-        # Example Problems Tab
-        with tab4:
-            st.subheader(f"Example Problems ({len(materials.get('example_problems', []))} examples)")
-            examples = materials.get('example_problems', [])
-            if examples:
-                for i, example in enumerate(examples):
-                    with st.expander(f"Example {i+1}: Problem Statement", expanded=False):
-                        st.write(f"**Problem:** {example.get('problem', '')}")
-                        st.write(f"**Solution:**")
-                        st.code(example.get('solution', ''), language='text')
-                        st.write(f"**Explanation:** {example.get('explanation', '')}")
-            else:
-                st.info("No example problems generated. Try again with a different topic.")
+        match = st.session_state.match
+        if match is not None:
+            st.info(f"♻️ Showing materials for **{match.topic}** ({match.subject}), a close match for your topic. "
+                    "Tick *Force fresh generation* to generate your topic itself.")
+        with get_telemetry().span('ui_render', view='materials'):
+            render_materials(*st.session_state.generated_for, st.session_state.materials)
     
     else:
         # Welcome message when no materials are generated
@@ -144,7 +315,7 @@ def main():
         1. **Enter your subject** in the sidebar
         2. **Enter the specific topic** you want to study  
         3. **Click "Generate Study Materials"**
-        4. **Explore** the generated content in different tabs
+        4. **Explore** the generated content section by section
         
         ### 📚 You'll get:
         - **Comprehensive summary** (4-6 paragraphs)
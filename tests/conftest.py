@@ -0,0 +1,29 @@
+import pytest
+
+from app.services import client_pool, gemini, singleflight
+from app.services.cache import SQLiteCache, set_cache
+from app.services.client_pool import ModelPool, set_pool
+from app.services.fake_gemini import FakeModel
+from app.services.topic_index import NullTopicIndex, set_topic_index
+
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    monkeypatch.setenv('STUDYMATE_FAKE_GEMINI', '1')
+    monkeypatch.setattr(gemini, 'GENERATION_MODE', 'single')
+    monkeypatch.setattr(gemini, '_shared', {})
+    monkeypatch.setattr(singleflight, '_flights', singleflight.SingleFlight(str(tmp_path / 'locks')))
+    models = {}
+
+    def factory(name):
+        models[name] = FakeModel(name)
+        return models[name]
+
+    previous = client_pool._pool
+    set_pool(ModelPool(None, model_names=['primary', 'backup'], factory=factory, failure_threshold=1))
+    set_cache(SQLiteCache(str(tmp_path / 'materials.db')))
+    set_topic_index(NullTopicIndex())
+    yield models
+    set_pool(previous)
+    set_cache(None)
+    set_topic_index(None)
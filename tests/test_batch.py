@@ -0,0 +1,30 @@
+import json
+
+from app import batch
+from app.services import gemini
+from app.services.exporters import EXPORTERS
+from app.services.topic_index import TopicIndex, set_topic_index
+
+PAIRS = [('History', 'French Revolution'), ('History', 'The French Revolution (1789)')]
+
+
+def test_batch_generates_close_matches_under_their_own_name(models, tmp_path):
+    set_topic_index(TopicIndex(None))
+    assert batch.run(PAIRS, concurrency=1, checkpoint=str(tmp_path / 'checkpoint.jsonl')) == 0
+    for subject, topic in PAIRS:
+        assert gemini.cached_study_material(subject, topic, exact=True) is not None
+    assert models['primary'].calls == 2
+
+
+def test_checkpoints_without_exact_lookups_are_checked_again(models, tmp_path):
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+    entries = [{'subject': 'History', 'topic': 'French Revolution', 'status': 'ok'},
+               {'subject': 'History', 'topic': 'The French Revolution (1789)', 'status': 'ok', 'exact': True}]
+    checkpoint.write_text(''.join(json.dumps(entry) + '\n' for entry in entries))
+    assert batch.load_checkpoint(str(checkpoint)) == {batch.checkpoint_key(*PAIRS[1])}
+
+
+def test_batch_pdfs_are_named_like_exported_ones(models, tmp_path):
+    pdf_dir = tmp_path / 'guides'
+    assert batch.run([('Programming', 'C++ / STL')], pdf_dir=str(pdf_dir)) == 0
+    assert [path.name for path in pdf_dir.iterdir()] == [EXPORTERS['pdf'].filename('Programming', 'C++ / STL')]
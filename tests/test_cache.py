@@ -0,0 +1,15 @@
+from app.services.cache import make_key, normalize_key
+
+
+def test_normalize_key_ignores_case_spacing_and_quotes():
+    assert normalize_key('  Newton’s   Laws ') == normalize_key("newton's laws")
+    assert normalize_key('"Photosynthesis."') == 'photosynthesis'
+
+
+def test_normalize_key_keeps_symbols_that_name_things():
+    keys = [normalize_key(text) for text in ('C', 'C++', 'C#', 'F#', '.NET')]
+    assert keys == ['c', 'c++', 'c#', 'f#', '.net']
+
+
+def test_make_key_tells_languages_apart():
+    assert make_key('Programming', 'C++', '1', 'model') != make_key('Programming', 'C', '1', 'model')
@@ -0,0 +1,18 @@
+import zipfile
+
+from app import batch, export
+from app.services.topic_index import TopicIndex, set_topic_index
+
+
+def test_export_finds_every_topic_batch_generated(models, tmp_path, capsys):
+    set_topic_index(TopicIndex(None))
+    syllabus = tmp_path / 'syllabus.csv'
+    syllabus.write_text('subject,topic\nHistory,French Revolution\nHistory,The French Revolution (1789)\n')
+    output = str(tmp_path / 'class.zip')
+    assert export.main([str(syllabus), '-o', output, '--format', 'markdown', '--workers', '1']) == 1
+    assert 'generate them with python -m app.batch' in capsys.readouterr().out
+
+    assert batch.main([str(syllabus), '--concurrency', '1']) == 0
+    assert export.main([str(syllabus), '-o', output, '--format', 'markdown', '--workers', '1']) == 0
+    with zipfile.ZipFile(output) as archive:
+        assert archive.namelist() == ['History/French_Revolution.md', 'History/The_French_Revolution_1789.md']
@@ -0,0 +1,29 @@
+import io
+import zipfile
+
+from app.models import Flashcard, StudyMaterials
+from app.services.exporters import export_bulk, export_document
+
+
+def materials(summary):
+    return StudyMaterials(summary, (Flashcard('Q?', 'A.'),), (), (), ())
+
+
+def test_bulk_export_matches_single_exports():
+    entries = [('Physics', 'Optics', materials('Light.')), ('Biology', 'Cells', materials('Life.'))]
+    output = io.BytesIO()
+    assert export_bulk(iter(entries), output, ['markdown', 'csv'], workers=1, max_pending=1) == 2
+    with zipfile.ZipFile(output) as archive:
+        assert archive.namelist() == ['Physics/Optics.md', 'Physics/Optics.csv',
+                                      'Biology/Cells.md', 'Biology/Cells.csv']
+        assert archive.read('Biology/Cells.md') == export_document('markdown', *entries[1])
+
+
+def test_bulk_export_keeps_clashing_names_apart():
+    entries = [('Math', 'C', materials('c')), ('Math', 'C++', materials('c++')), ('Math', 'C', materials('c'))]
+    output = io.BytesIO()
+    export_bulk(iter(entries), output, ['markdown'], workers=1)
+    with zipfile.ZipFile(output) as archive:
+        names = archive.namelist()
+    assert len(set(names)) == 3
+    assert names[0] == 'Math/C.md'
@@ -0,0 +1,38 @@
+import pytest
+
+from app.errors import NotCachedError
+from app.services import client_pool, gemini
+from app.services.topic_index import TopicIndex, set_topic_index
+
+
+def test_failover_keeps_serving_cached_topics(models):
+    pool = client_pool.get_pool(None)
+    first = gemini.build_study_material('Physics', 'Optics')
+    pool.record_failure('primary')
+    assert pool.model_name == 'backup'
+    assert gemini.build_study_material('Physics', 'Optics') is first
+    assert models['backup'].calls == 0
+
+
+def test_extend_reads_the_cached_materials(models):
+    generated = gemini.build_study_material('Physics', 'Optics')
+    extended = gemini.extend_materials('Physics', 'Optics', 'flashcards', count=3)
+    assert extended.flashcards[:len(generated.flashcards)] == generated.flashcards
+    assert len(extended.flashcards) == len(generated.flashcards) + 3
+    # A second extension builds on the first instead of replacing its items
+    again = gemini.extend_materials('Physics', 'Optics', 'flashcards', count=3)
+    assert again.flashcards[:len(extended.flashcards)] == extended.flashcards
+    assert gemini.cached_study_material('Physics', 'Optics') is again
+
+
+def test_extend_needs_a_cached_topic(models):
+    with pytest.raises(NotCachedError):
+        gemini.extend_materials('Physics', 'Quantum Tunnelling', 'flashcards')
+    assert gemini.cached_study_material('Physics', 'Quantum Tunnelling') is None
+
+
+def test_exact_lookup_skips_close_matches(models):
+    set_topic_index(TopicIndex(None))
+    generated = gemini.build_study_material('History', 'French Revolution')
+    assert gemini.cached_study_material('History', 'The French Revolution (1789)') is generated
+    assert gemini.cached_study_material('History', 'The French Revolution (1789)', exact=True) is None
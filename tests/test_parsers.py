@@ -0,0 +1,87 @@
+import json
+import re
+
+import pytest
+
+from app.services.fake_gemini import fake_materials
+from app.utils.parsers import (PARSE_ERROR_SUMMARY, SECTIONS, IncrementalParser, parse_materials, parse_response,
+                               validate_item)
+
+MATERIALS = fake_materials('Physics', 'Optics')
+# Quotes, backslashes and unicode escapes inside strings, which chunking must not break up
+MATERIALS['flashcards'][0] = {'question': 'What does "\\n" mean in C\\\\?', 'answer': 'A newline, é → \\u00e9'}
+TEXT = json.dumps(MATERIALS, indent=2)
+# The summary comes back stripped
+EXPECTED = dict(MATERIALS, summary=MATERIALS['summary'].strip())
+
+
+def feed(text, size):
+    parser = IncrementalParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64])
+def test_chunked_feeding_matches_one_feed(size):
+    _, expected = feed(TEXT, len(TEXT))
+    parser, events = feed(TEXT, size)
+    assert events == expected
+    assert parser.done
+    assert parser.materials == MATERIALS
+
+
+def test_escapes_split_across_chunks():
+    split = TEXT.index('\\\\') + 1
+    parser = IncrementalParser()
+    events = parser.feed(TEXT[:split]) + parser.feed(TEXT[split:])
+    assert ('flashcards', MATERIALS['flashcards'][0]) in events
+
+
+@pytest.mark.parametrize('wrap', ['{}', '```json\n{}\n```', 'Here are your materials:\n```json\n{}\n```\nGood luck!'])
+def test_fences_and_chatter_are_skipped(wrap):
+    result = parse_materials(wrap.format(TEXT))
+    assert result.materials.to_dict() == EXPECTED
+    assert result.missing == ()
+    assert not result.partial
+
+
+def test_truncated_output_keeps_the_items_that_closed():
+    cut = TEXT.index('"hard_terms"') - 400
+    result = parse_materials(TEXT[:cut])
+    assert result.partial
+    assert result.materials.flashcards == parse_materials(TEXT).materials.flashcards
+    assert 0 < len(result.materials.mcqs) < len(MATERIALS['mcqs'])
+    assert result.missing == ('hard_terms', 'example_problems')
+
+
+def test_trailing_commas_are_tolerated():
+    text = re.sub(r'"\n(\s*)}', '",\n\\1}', TEXT)
+    result = parse_materials(text)
+    assert result.partial
+    assert result.materials.to_dict() == EXPECTED
+    assert result.missing == ()
+
+
+def test_missing_reports_sections_with_nothing_usable():
+    text = json.dumps({'summary': '  ', 'flashcards': [{'question': 'Q?', 'answr': 'typo'}],
+                       'mcqs': MATERIALS['mcqs'], 'hard_terms': 'not a list'})
+    result = parse_materials(text)
+    assert result.missing == ('summary', 'flashcards', 'hard_terms', 'example_problems')
+    assert len(result.materials.mcqs) == len(MATERIALS['mcqs'])
+
+
+def test_unparseable_response_falls_back_to_an_error_summary():
+    materials = parse_response('Sorry, I cannot help with that.')
+    assert materials.summary == PARSE_ERROR_SUMMARY
+    assert not materials.has_items()
+    assert parse_materials('').missing == SECTIONS
+
+
+def test_validate_item_cleans_or_rejects_items():
+    item = MATERIALS['mcqs'][0]
+    assert validate_item('mcqs', item) is item
+    assert validate_item('flashcards', {'question': ' Q? ', 'answer': 42}) == {'question': 'Q?', 'answer': '42'}
+    assert validate_item('mcqs', {'question': 'Q?', 'options': 'A', 'correct_answer': 'A'}) is None
+    assert validate_item('hard_terms', ['term', 'explanation']) is None
@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+
+from app.services import gemini
+from app.services.client_pool import ModelPool
+from app.services.fake_gemini import FakeModel
+from app.services.prompts import build_prompt
+from app.services.scheduler import BATCH, INTERACTIVE, RequestScheduler, TokenBucket, set_scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def raising(error):
+    def fn():
+        raise error
+    return fn
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now += 600
+    assert bucket.wait_time(60) == 0
+    bucket.consume(60)
+    assert bucket.tokens == pytest.approx(0)
+
+
+def test_oversized_requests_wait_for_a_full_bucket_only():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)
+    bucket.consume(60)
+    assert bucket.wait_time(1000) == pytest.approx(60.0)
+
+
+def test_requests_wait_for_the_rpm_budget():
+    clock = FakeClock()
+    scheduler = RequestScheduler(rpm=2, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        scheduler.run(lambda: None)
+    # The third request waits 30 s for the bucket to refill one request
+    assert clock.now == pytest.approx(30.0)
+    assert scheduler.stats()['dispatched'] == 3
+
+
+def test_higher_priority_requests_go_first():
+    clock = FakeClock()
+    release = threading.Event()
+
+    def sleep(seconds):
+        release.wait(5)
+        clock.sleep(seconds)
+
+    scheduler = RequestScheduler(rpm=60, clock=clock, sleep=sleep)
+    scheduler.requests.consume(60)
+    order = []
+    consume = scheduler.token_budget.consume
+
+    def record(amount):
+        # Called under the scheduler's lock as each request is dispatched
+        order.append(threading.current_thread().name)
+        consume(amount)
+
+    scheduler.token_budget.consume = record
+    threads = []
+    for name, priority in [('batch-1', BATCH), ('batch-2', BATCH), ('interactive', INTERACTIVE)]:
+        threads.append(threading.Thread(target=scheduler.acquire, args=(1, priority), name=name))
+        threads[-1].start()
+        while scheduler.stats()['queue_depth'] < len(threads):
+            time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert order == ['interactive', 'batch-1', 'batch-2']
+
+
+def test_retryable_errors_back_off_exponentially():
+    clock = FakeClock()
+    delays = []
+
+    def sleep(seconds):
+        delays.append(seconds)
+        clock.sleep(seconds)
+
+    scheduler = RequestScheduler(base_delay=1.0, max_delay=3.0, clock=clock, sleep=sleep, rng=lambda: 1.0)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 4:
+            raise ResourceExhausted("429 Quota exceeded")
+        return 'ok'
+
+    assert scheduler.run(flaky) == 'ok'
+    assert delays == [1.0, 2.0, 3.0]
+    assert scheduler.stats()['retries'] == 3
+
+
+def test_jitter_halves_the_delay_at_most():
+    clock = FakeClock()
+    delays = []
+    scheduler = RequestScheduler(max_retries=1, clock=clock, sleep=delays.append, rng=lambda: 0.0)
+    with pytest.raises(ResourceExhausted):
+        scheduler.run(raising(ResourceExhausted("quota")))
+    assert delays == [0.5]
+    assert scheduler.stats()['failures'] == 1
+
+
+def test_other_errors_are_not_retried():
+    scheduler = RequestScheduler(sleep=pytest.fail)
+    with pytest.raises(ValueError):
+        scheduler.run(raising(ValueError("bad request")))
+    assert scheduler.stats()['retries'] == 0
+
+
+def test_pool_failover_takes_a_permit_per_call(monkeypatch):
+    monkeypatch.setattr(gemini, 'generation_config', lambda: None)
+    clock = FakeClock()
+    scheduler = RequestScheduler(clock=clock, sleep=clock.sleep)
+    set_scheduler(scheduler)
+    try:
+        models = {'primary': FakeModel('primary', error_rate=1.0), 'backup': FakeModel('backup')}
+        pool = ModelPool(None, model_names=list(models), factory=models.__getitem__)
+        gemini.call_model(pool, build_prompt('Physics', 'Optics'))
+    finally:
+        set_scheduler(None)
+    assert (models['primary'].calls, models['backup'].calls) == (1, 1)
+    assert scheduler.stats()['dispatched'] == 2
@@ -0,0 +1,78 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from app.errors import NotCachedError
+from app.models import StudyMaterials
+from app.server import make_server
+from app.services.fake_gemini import fake_materials
+
+
+class FakeCore:
+    """Stands in for gemini.extend_materials over a dict of cached materials"""
+
+    def __init__(self):
+        self.cached = {('Physics', 'Optics'): StudyMaterials.from_dict(fake_materials('Physics', 'Optics'))}
+        self.calls = []
+
+    def extend(self, subject, topic, section, count):
+        self.calls.append((subject, topic, section, count))
+        if (subject, topic) not in self.cached:
+            raise NotCachedError(f"No cached materials for {topic}")
+        return self.cached[subject, topic]
+
+
+@pytest.fixture
+def service():
+    core = FakeCore()
+    server = make_server(port=0, workers=1, extend=core.extend)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}', core
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'), method='POST',
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_extend_ignores_materials_sent_by_the_client(service):
+    url, core = service
+    status, body = post(url + '/extend', {'subject': 'Physics', 'topic': 'Optics', 'section': 'mcqs',
+                                          'count': 2, 'materials': {'summary': 'HACKED'}})
+    assert status == 200
+    assert body['materials']['summary'] != 'HACKED'
+    assert core.calls == [('Physics', 'Optics', 'mcqs', 2)]
+
+
+def test_extend_rejects_topics_that_are_not_cached(service):
+    url, core = service
+    status, body = post(url + '/extend', {'subject': 'Physics', 'topic': 'Quantum Tunnelling',
+                                          'section': 'flashcards', 'materials': {'summary': 'HACKED'}})
+    assert status == 404
+    assert body['error_type'] == 'NotCachedError'
+
+
+def test_extend_validates_the_request(service):
+    url, core = service
+    assert post(url + '/extend', {'subject': 'Physics', 'topic': 'Optics', 'section': 'summary'})[0] == 400
+    assert post(url + '/extend', {'subject': 'Physics', 'topic': 'Optics', 'section': 'mcqs', 'count': 500})[0] == 400
+    assert core.calls == []
+
+
+@pytest.mark.parametrize('priority', [['batch'], {'level': 'batch'}, 'urgent'])
+def test_jobs_reject_bad_priorities(service, priority):
+    url, core = service
+    status, body = post(url + '/jobs', {'subject': 'Physics', 'topic': 'Optics', 'priority': priority})
+    assert status == 400
+    assert 'priority' in body['error']
@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+
+from app.services.singleflight import SingleFlight
+
+
+def test_followers_wait_for_the_leader(tmp_path):
+    flights = SingleFlight(str(tmp_path))
+    results = []
+
+    def follow():
+        with flights.hold('key') as waited:
+            results.append(waited)
+
+    with flights.hold('key') as waited:
+        results.append(waited)
+        follower = threading.Thread(target=follow)
+        follower.start()
+        time.sleep(0.05)
+        assert len(results) == 1
+    follower.join(1)
+    assert results == [False, True]
+
+
+def test_wait_is_bounded_when_the_leader_hangs(tmp_path):
+    flights = SingleFlight(str(tmp_path), timeout=0.1)
+    release = threading.Event()
+
+    def hung_leader():
+        with flights.hold('key'):
+            release.wait(5)
+
+    leader = threading.Thread(target=hung_leader)
+    leader.start()
+    time.sleep(0.02)
+    start = time.monotonic()
+    with flights.hold('key') as waited:
+        assert waited
+    assert time.monotonic() - start < 1
+    assert flights.stats()['timeouts'] == 1
+    release.set()
+    leader.join(1)
+
+
+def test_other_processes_wait_is_bounded(tmp_path):
+    # A second instance stands in for another worker process sharing the lock directory
+    leader = SingleFlight(str(tmp_path))
+    follower = SingleFlight(str(tmp_path), timeout=0.1)
+    with leader.hold('key'):
+        with follower.hold('key') as waited:
+            assert waited
+    assert follower.stats()['timeouts'] == 1
+
+
+def test_lock_files_are_removed(tmp_path):
+    flights = SingleFlight(str(tmp_path))
+    for key in ('a', 'b', 'a'):
+        with flights.hold(key):
+            pass
+    assert os.listdir(tmp_path) == []
+    assert flights.stats()['in_flight'] == 0
@@ -0,0 +1,63 @@
+import pytest
+
+from app.services.topic_index import TopicIndex
+
+
+def find(indexed, asked, subject='History'):
+    index = TopicIndex(None)
+    index.add(subject, indexed)
+    return index.find(subject, asked)
+
+
+@pytest.mark.parametrize('indexed, asked', [
+    ('French Revolution', 'The French Revolution (1789)'),
+    ('The French Revolution (1789)', 'French Revolution'),
+    ('Object Oriented Programming', 'OOP'),
+    ('OOP', 'Object Oriented Programming'),
+    ("Newton's Laws of Motion", 'newtons law of motion'),
+    ('Cellular Respiration', 'Celular Respiration'),
+    ('World War II', 'World War II (1939-1945)'),
+])
+def test_paraphrases_match(indexed, asked):
+    assert find(indexed, asked).topic == indexed
+
+
+@pytest.mark.parametrize('indexed, asked', [
+    ('World War I', 'World War II'),
+    ('Organic Chemistry', 'Inorganic Chemistry'),
+    ('Binary Search', 'Binary Search Trees'),
+    ('French Revolution (1789)', 'French Revolution (1848)'),
+    ('Calculus', 'Calculus (II)'),
+    ('C', 'C++'),
+    ('C++', 'C#'),
+    ('Proton Emission', 'Photon Emission'),
+    ('Alkene Reactions', 'Alkane Reactions'),
+    ('Alkenes and Alkynes', 'Alkanes and Alkenes'),
+    ('Line Rule', 'Sine Rule'),
+])
+def test_different_topics_dont_match(indexed, asked):
+    assert find(indexed, asked) is None
+
+
+def test_only_the_same_subject_matches():
+    index = TopicIndex(None)
+    index.add('Computer Science', 'Object Oriented Programming')
+    index.add('Computer Science', 'Neural Networks')
+    index.add('Political Science', 'Neural Networks')
+    assert index.find('CS', 'OOP').topic == 'Object Oriented Programming'
+    assert index.find('Biology', 'Object Oriented Programming') is None
+    # Subjects sharing an acronym are still different subjects
+    assert index.find('Cognitive Science', 'Neural Networks') is None
+    assert index.find('Physical Science', 'Neural Networks') is None
+    assert index.find('Political Science', 'Neural Networks').subject == 'Political Science'
+
+
+def test_index_reloads_from_its_log_and_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr('app.services.topic_index.SNAPSHOT_EVERY', 2)
+    path = str(tmp_path / 'topics.jsonl')
+    index = TopicIndex(path)
+    for topic in ('Cell Biology', 'Genetics', 'The French Revolution (1789)'):
+        index.add('History', topic)
+    reloaded = TopicIndex(path)
+    assert reloaded.stats()['topics'] == 3
+    assert reloaded.find('History', 'French Revolution').topic == 'The French Revolution (1789)'
@@ -0,0 +1,40 @@
+import pytest
+
+streamlit_testing = pytest.importorskip('streamlit.testing.v1')
+
+from app.services import singleflight
+from app.services.cache import SQLiteCache, set_cache
+from app.services.topic_index import NullTopicIndex, set_topic_index
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('STUDYMATE_FAKE_GEMINI', '1')
+    monkeypatch.setenv('STUDYMATE_PAGE_SIZE', '4')
+    monkeypatch.delenv('STUDYMATE_SERVICE_URL', raising=False)
+    monkeypatch.setattr(singleflight, '_flights', singleflight.SingleFlight(str(tmp_path / 'locks')))
+    set_cache(SQLiteCache(str(tmp_path / 'materials.db')))
+    set_topic_index(NullTopicIndex())
+    app = streamlit_testing.AppTest.from_file('../minorproject.py', default_timeout=60).run()
+    app.sidebar.text_input[0].input('Physics')
+    app.sidebar.text_input[1].input('Optics')
+    app.sidebar.button[0].click().run()
+    yield app
+    set_cache(None)
+    set_topic_index(None)
+
+
+def page_controls(app):
+    return (app.caption[0].value, app.button(key='flashcards_prev').disabled,
+            app.button(key='flashcards_next').disabled)
+
+
+def test_page_buttons_follow_the_page_shown(app):
+    assert page_controls(app) == ('Page 1 of 4', True, False)
+    app.button(key='flashcards_next').click().run()
+    assert page_controls(app) == ('Page 2 of 4', False, False)
+    for _ in range(2):
+        app.button(key='flashcards_next').click().run()
+    assert page_controls(app) == ('Page 4 of 4', False, True)
+    app.button(key='flashcards_prev').click().run()
+    assert page_controls(app) == ('Page 3 of 4', False, False)